@@ -102,102 +102,20 @@ gpiochip nodes (possibly in conjunction with schematics) to determine
 the correct GPIO number to use for a given signal.
 """
 
-import os
+import sys
 import time
+import array
+import heapq
+import itertools
 import threading
+import traceback
 import select
 from . import constants
-
-
-class SysfsGPIO(object):
-    attributes = ('value', 'direction', 'active_low', 'edge')
-
-    def __init__(self, pin):
-        self.pin = int(pin)
-        self.path = '/sys/class/gpio/gpio{:d}'.format(pin)
-        self._file = {}
-        self._write_lock = threading.Lock()
-        self._read_lock = threading.Lock()
-
-    def __repr__(self):
-        if self.export:
-            return '<gpio{} {} edge:{} mode:{} at {}>'.format(
-                self.pin, 'HIGH' if self.value else 'LOW', self.edge.title(),
-                self.direction.upper(), hex(self.__hash__()))
-        else:
-            return '<gpio{} unexported at {}>'.format(
-                self.pin, hex(self.__hash__()))
-
-    @property
-    def export(self):
-        return os.path.exists(self.path)
-
-    @property
-    def value(self):
-        return int(self._read('value'))
-
-    @property
-    def direction(self):
-        return self._read('direction')
-
-    @property
-    def active_low(self):
-        return int(self._read('active_low'))
-
-    @property
-    def edge(self):
-        return self._read('edge')
-
-    @export.setter
-    def export(self, value):
-        # open or reopen attr files
-        # gpio pin will be registed if it is not yet
-        if value:
-            if not self.export:
-                with open('/sys/class/gpio/export', 'w') as f:
-                    f.write(str(self.pin))
-            for attr in self.attributes:
-                fn = os.path.join(self.path, attr)
-                self._file[attr] = open(fn, 'wb+', buffering=0)
-        # close attr files
-        # gpio will be unexported if it exists
-        else:
-            if self.export:
-                with open('/sys/class/gpio/unexport', 'w') as f:
-                    f.write(str(self.pin))
-            for h in list(self._file.values()):
-                h.close()
-            self._file.clear()
-
-    @value.setter
-    def value(self, data):
-        self._write('value', data)
-
-    @direction.setter
-    def direction(self, data):
-        self._write('direction', data)
-
-    @active_low.setter
-    def active_low(self, data):
-        self._write('active_low', data)
-
-    @edge.setter
-    def edge(self, data):
-        self._write('edge', data)
-
-    def fileno(self, attr='value'):
-        return self._file[attr].fileno()
-
-    def _read(self, attr):
-        with self._read_lock:
-            self._file[attr].seek(0)
-            value = self._file[attr].read().strip()
-        return value
-
-    def _write(self, attr, data):
-        with self._write_lock:
-            self._file[attr].seek(0)
-            self._file[attr].write(str(data).encode('utf-8'))
+from .executor import CallbackExecutor
+from .pwm import _PWM, _HardwarePWM
+from .backends import (Backend, SysfsBackend, SimulatedBackend,
+                       SunxiBackend, SysfsGPIO, SimulatedGPIO, SunxiGPIO,
+                       PinHandle, SysfsHandle)
 
 
 class GPIO(object):
@@ -219,21 +137,29 @@ class GPIO(object):
     BCM = constants.BCM
     VERSION = 1.0
 
+    # mode, backend and pin state are shared by all instances
+    _mode = BOARD
+    _lookup = getattr(BOARD, 'table', BOARD)
     _pin_dict = {}
     _pwm_dict = {}
+    _handle_dict = {}
     _irq_dict = {}
-    _flag_interrupts = threading.Event()
+    _irq_fds = {}  # fd -> _IRQ, O(1) lookup in the dispatcher
+    _maxevents = 64
+    _executor = None  # run callbacks inline if None
+    _backend = SysfsBackend()
+    _thread_irq = None
+    _flag_interrupts_enable = threading.Event()
+    _flag_interrupts_stop = threading.Event()
     _epoll = select.epoll()
-
-    def __init__(self):
-        self._mode = self.BOARD  # default mode
-
-    def _time_ms(self):
-        return time.time() * 1000
+    # pending debounce re-checks: (deadline_ns, seq, irq, ts)
+    _bounce_heap = []
+    _bounce_seq = itertools.count()
+    _bounce_lock = threading.Lock()
 
     def _get_pin_num(self, pin, must_in_dict=False):
         try:
-            p = self._mode[pin]
+            p = self._lookup[pin]
         except:
             raise KeyError(('Invalid pin({}) or unsupported mode!\n'
                             'Reset mode and check pin num.').format(pin))
@@ -267,19 +193,25 @@ class GPIO(object):
         pins = [self._get_pin_num(p) for p in self._listify(pin)]
         # pad state_list and initial_list in case someone
         # want to setup more than one pin at one time
-        states, initials = self._listify(state, initial, padlen=len(pin))
+        states, initials = self._listify(state, initial, padlen=len(pins))
 
-        # register all pins and init them
-        for p, s, i in zip(pins, states, initials):
+        for s in states:
             # if s == self.PULLUP:
             #     s, i = self.IN, self.HIGH
             # elif s == self.PULLDN:
             #     s, i = self.IN, self.LOW
             if s not in [self.IN, self.OUT]:
                 raise ValueError('Invalid state: {}!'.format(s))
-            if p not in self._pin_dict:
-                self._pin_dict[p] = SysfsGPIO(p)
-                self._pin_dict[p].export = True
+
+        # export new pins in one batch, then init all of them
+        new = {}
+        for p in pins:
+            if p not in self._pin_dict and p not in new:
+                new[p] = self._backend.gpio(p)
+        if new:
+            self._backend.export(list(new.values()))
+            self._pin_dict.update(new)
+        for p, s, i in zip(pins, states, initials):
             self._pin_dict[p].direction = s
             if s == self.OUT and i in [self.HIGH, self.LOW]:
                 self._pin_dict[p].value = i
@@ -290,7 +222,7 @@ class GPIO(object):
             return self._pin_dict[
                 self._get_pin_num(pin, must_in_dict=True)].value
         # multichannel values
-        pins = [self._get_pin_num(pin, must_in_dict=True)
+        pins = [self._get_pin_num(p, must_in_dict=True)
                 for p in self._listify(pin)]
         return [self._pin_dict[p].value for p in pins]
 
@@ -303,67 +235,163 @@ class GPIO(object):
                 raise ValueError('Invalid value: {}'.format(v))
             self._pin_dict[p].value = int(v)
 
+    def pin(self, pin):
+        '''
+        Return a handle bound to a setup pin with read(), write(value),
+        high(), low() and toggle(), which skip all per call dispatch of
+        `input` / `output`. The handle is invalidated by `cleanup`.
+        '''
+        p = self._get_pin_num(pin, must_in_dict=True)
+        try:
+            return self._handle_dict[p]
+        except KeyError:
+            pass
+        gpio = self._pin_dict[p]
+        cls = SysfsHandle if isinstance(gpio, SysfsGPIO) else PinHandle
+        handle = self._handle_dict[p] = cls(pin, gpio)
+        return handle
+
     def cleanup(self, pin=None):
         if pin is None:
-            pins = list(self._pin_dict.keys())  # py2&py3 compatiable
+            pins = set(self._pin_dict) | set(self._pwm_dict)
         else:
             pins = [self._get_pin_num(p) for p in self._listify(pin)]
         for p in pins:
+            handle = self._handle_dict.pop(p, None)
+            if handle:
+                handle.invalidate()
             pin = self._pin_dict.pop(p, None)
-            if pin:
-                pin.export = False
             pwm = self._pwm_dict.pop(p, None)
             if pwm:
                 pwm.clear()
             irq = self._irq_dict.pop(p, None)
             if irq:
-                irq['flag_stop'].set()
-                irq['flag_triggered'].clear()
+                self._irq_fds.pop(irq.fd, None)
+                self._epoll.unregister(irq.fd)
+                irq.interrupted.clear()
+            if pin:
+                pin.export = False
 
-    def enable_interrupts(self):
-        if hasattr(self, '_thread_irq'):
-            self._flag_interrupts_pause.clear()
+    def enable_interrupts(self, maxevents=None):
+        '''
+        Start (or resume) the interrupts handler thread. At most
+        `maxevents` edges are fetched from epoll by one wake-up.
+        '''
+        if maxevents is not None:
+            if maxevents < 1:
+                raise ValueError('Invalid maxevents: {}'.format(maxevents))
+            GPIO._maxevents = int(maxevents)
+        self._flag_interrupts_enable.set()
+        if self._thread_irq is not None and self._thread_irq.is_alive():
             return
-        self._thread_irq = threading.Thread(target=self._handle_interrupts)
-        self._thread_irq.setDeamon(True)
+        self._flag_interrupts_stop.clear()
+        GPIO._thread_irq = threading.Thread(target=self._handle_interrupts)
+        self._thread_irq.daemon = True
         self._thread_irq.start()
 
     def disable_interrupts(self):
-        self._flag_interrupts_pause.set()
+        self._flag_interrupts_enable.clear()
 
     def close_interrupts(self):
         self._flag_interrupts_stop.set()
-
-    def _recheck_bounce(self, p, bouncetime):
-        time.sleep(bouncetime / 1000.0)
-        edge = self._pin_dict[p].edge
-        value = self._pin_dict[p].value
-        rise = (edge == self.RISING and value == self.HIGH)
-        fall = (edge == self.FALLING and value == self.LOW)
-        return (rise or fall)
+        self._flag_interrupts_enable.set()  # wake up paused handler
+        if self._thread_irq is not None:
+            self._thread_irq.join()
+            GPIO._thread_irq = None
+        self._flag_interrupts_enable.clear()
 
     def _handle_interrupts(self):
-        while not self._flag_interrupts_stop.isSet():
-            self._flag_interrupts_pause.wait()
-            rst = self._epoll.poll(timeout=1)
-            if not rst:
+        while not self._flag_interrupts_stop.is_set():
+            self._flag_interrupts_enable.wait()
+            timeout = self._debounce()
+            rst = self._epoll.poll(
+                1 if timeout is None else min(timeout, 1), self._maxevents)
+            if rst:
+                self._dispatch(rst)
+        sys.stderr.write('[GPIO interrupts handler] shutdown\n')
+
+    def _dispatch(self, events):
+        # handle all (fd, event) pairs returned by one epoll.poll
+        fds = self._irq_fds
+        for fd, event in events:
+            irq = fds.get(fd)
+            if irq is None:  # removed while events were pending
                 continue
-            for fd, event in rst:
-                for p in self._irq_dict:
-                    if self._irq_dict[p]['fd'] == fd:
-                        bt = self._irq_dict[p]['bouncetime']
-                        break
-                if bt and not self._recheck_bounce(p, bt):
-                    continue
-                self._irq_dict[p]['interrupted'].set()
-                for c in self._irq_dict[p]['callbacks']:
-                    try:
-                        c(self._irq_dict[p]['pin_name'])
-                    except:
-                        pass
-        print('[GPIO interrupts handler] shutdown')
-
-    def add_event_detect(self, pin, edge, func=None, bouncetime=None):
+            ts = time.monotonic_ns()
+            value = irq.gpio.acknowledge()
+            if not irq.bouncetime:
+                self._fire(irq, ts, value)
+            elif not irq.pending:
+                # re-check level once the line settled, other edges of this
+                # burst are bounces and only acknowledged
+                irq.pending = True
+                with self._bounce_lock:
+                    heapq.heappush(self._bounce_heap, (
+                        ts + irq.bouncetime * 1000000,
+                        next(self._bounce_seq), irq, ts))
+
+    def _debounce(self):
+        '''
+        Fire debounced edges whose re-check is due. Return seconds until
+        the next re-check or None if there is none pending.
+        '''
+        while True:
+            with self._bounce_lock:
+                if not self._bounce_heap:
+                    return None
+                now = time.monotonic_ns()
+                deadline, _, irq, ts = self._bounce_heap[0]
+                if deadline > now:
+                    return (deadline - now) / 1e9
+                heapq.heappop(self._bounce_heap)
+            irq.pending = False
+            if self._irq_fds.get(irq.fd) is not irq:  # removed meanwhile
+                continue
+            value = irq.gpio.acknowledge()
+            if irq.edge == self.RISING:
+                stable = value == self.HIGH
+            elif irq.edge == self.FALLING:
+                stable = value == self.LOW
+            else:  # BOTH: level differs from the last accepted one
+                stable = value != irq.level
+            if stable:
+                self._fire(irq, ts, value)
+            else:
+                irq.rejected += 1
+
+    def _fire(self, irq, ts, value):
+        irq.level = value
+        if irq.events is not None:
+            irq.events.put(ts, value)
+        irq.interrupted.set()
+        for listener in irq.listeners:
+            # a failing listener must not kill the interrupts handler
+            try:
+                listener(irq.pin_name, value, ts)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+        if irq.callbacks:
+            self._invoke(irq, ts)
+
+    def _invoke(self, irq, ts):
+        # run callbacks of an edge stamped `ts`, replaced by gpio4.metrics
+        if self._executor is not None:
+            self._executor.submit(irq.pin, irq.callbacks, irq.pin_name)
+            return
+        for c in irq.callbacks:
+            try:
+                c(irq.pin_name)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    def add_event_detect(self, pin, edge, func=None, bouncetime=None,
+                         queue_size=1024):
+        '''
+        Watch `edge` on pin. Each edge calls `func` (one or a list of
+        callables) with pin name and is stored with its timestamp and
+        value in a ring buffer of `queue_size` entries, see `drain_events`.
+        Use queue_size=0 to disable the ring buffer.
+        '''
         p = self._get_pin_num(pin, must_in_dict=True)
         if edge not in [self.RISING, self.FALLING, self.BOTH]:
             raise ValueError('Invalid edge: {}'.format(edge))
@@ -373,52 +401,228 @@ class GPIO(object):
                              '`GPIO.remove_event_detect({})` first'
                              '').format(pin, self._pin_dict[p].edge, pin))
         self._pin_dict[p].direction = 'in'
-        self._pin_dict[p].edge = edge
-        fd = self._pin_dict[p].fileno('value')
-        self._irq_dict[p] = {
-            'fd': fd, 'interrupted': threading.Event(), 'pin_name': pin,
-            'bouncetime': bouncetime or 0,
-            'callbacks': self._listify(func) or []
-        }
-        self._epoll.register(fd, select.EPOLLPRI | select.EPOLLET)
+        # sysfs names CHANGE as 'both'
+        self._pin_dict[p].edge = 'both' if edge == self.BOTH else edge
+        irq = _IRQ(p, pin, edge, self._pin_dict[p], bouncetime,
+                   [c for c in self._listify(func) if c is not None],
+                   _EdgeQueue(queue_size) if queue_size else None)
+        irq.level = irq.gpio.acknowledge()
+        self._epoll.register(irq.fd, irq.gpio.poll_events)
+        self._irq_dict[p] = self._irq_fds[irq.fd] = irq
 
     def remove_event_detect(self, pin):
         p = self._get_pin_num(pin, must_in_dict=True)
         if p in self._irq_dict:
-            self._epoll.unregister(self._irq_dict[p]['fd'])
-            self._irq_dict.remove(p)
+            irq = self._irq_dict.pop(p)
+            self._irq_fds.pop(irq.fd, None)
+            self._epoll.unregister(irq.fd)
 
-    def add_event_callback(self, pin, callback):
+    def _get_irq(self, pin):
         p = self._get_pin_num(pin, must_in_dict=True)
         if p not in self._irq_dict:
             raise NameError(('Pin {} is not initialized with edge yet, please '
                              'run `GPIO.add_event_detect({}, edge)` first'
                              '').format(pin, pin))
-        self._irq_dict[p]['callbacks'] += self._listify(callback)
+        return self._irq_dict[p]
+
+    def add_event_callback(self, pin, callback):
+        self._get_irq(pin).callbacks += self._listify(callback)
 
-    def wait_for_edge(self, pin, edge, timeout=constants.FOREVER_ms):
+    def event_queue(self, pin):
+        '''Ring buffer of edges captured on pin, None if disabled.'''
+        return self._get_irq(pin).events
+
+    def drain_events(self, pin, maxlen=None):
+        '''
+        Pop at most `maxlen` (all by default) captured edges of pin at once.
+        Return two arrays: time.monotonic_ns() timestamps and values.
+        '''
+        events = self._get_irq(pin).events
+        if events is None:
+            raise NameError(('Pin {} has no event queue, add event detect '
+                             'with queue_size > 0').format(pin))
+        return events.drain(maxlen)
+
+    def _watch(self, pin, edge):
+        # return irq record of pin and whether it is added only for waiting
         p = self._get_pin_num(pin, must_in_dict=True)
         if edge not in [self.RISING, self.FALLING, self.BOTH]:
             raise ValueError('Invalid edge: {}'.format(edge))
-        if p in self._irq_dict and edge != self._pin_dict[p].edge:
+        if p not in self._irq_dict:
+            self.add_event_detect(pin, edge, queue_size=0)
+            return self._irq_dict[p], True
+        if edge != self._irq_dict[p].edge:
             raise NameError(('Pin {} is already been attached to an interrupt '
                              'on {} edge, if you want to reset it, please run '
                              '`GPIO.remove_event_detect({})` first'
-                             '').format(pin, self._pin_dict[p].edge, pin))
-        start = self._time_ms()
-        while not self._irq_dict[p]['interrupted'].isSet():
-            if (self._time_ms() - start) > timeout:
-                return None
-            time.sleep(1.0/10)  # sensibility: refresh 10 times per second
-        self._irq_dict[p]['interrupted'].clear()
-        return pin
+                             '').format(pin, self._irq_dict[p].edge, pin))
+        return self._irq_dict[p], False
+
+    def _block(self, irqs, flag, timeout):
+        # wait until a listener of irqs sets flag or timeout seconds elapsed
+        if self._thread_irq is not None and self._thread_irq.is_alive() \
+                and self._flag_interrupts_enable.is_set():
+            return flag.wait(timeout)
+        # no handler thread, poll the value fds right here
+        epoll = select.epoll()
+        try:
+            for irq in irqs:
+                epoll.register(irq.fd, irq.gpio.poll_events)
+            deadline = None if timeout is None \
+                else time.monotonic() + timeout
+            while not flag.is_set():
+                remain = -1 if deadline is None \
+                    else deadline - time.monotonic()
+                if deadline is not None and remain <= 0:
+                    break
+                bounce = self._debounce()
+                if bounce is not None and not flag.is_set():
+                    remain = bounce if remain < 0 else min(remain, bounce)
+                if not flag.is_set():
+                    self._dispatch(epoll.poll(remain, len(irqs)))
+        finally:
+            epoll.close()
+        return flag.is_set()
+
+    def _wait(self, irqs, timeout):
+        fired = []
+        flag = threading.Event()
+
+        def listener(pin_name, value, ts):
+            fired.append(pin_name)
+            flag.set()
+
+        for irq in irqs:
+            irq.listeners.append(listener)
+        try:
+            # edges caught before waiting
+            for irq in irqs:
+                if irq.interrupted.is_set():
+                    irq.interrupted.clear()
+                    return irq.pin_name
+            if timeout is not None:
+                timeout = max(timeout, 0) / 1000.0
+            self._block(irqs, flag, timeout)
+        finally:
+            for irq in irqs:
+                irq.listeners.remove(listener)
+        if not fired:
+            return None
+        for irq in irqs:
+            if irq.pin_name == fired[0]:
+                irq.interrupted.clear()
+        return fired[0]
+
+    def wait_for_edge(self, pin, edge, timeout=None):
+        '''
+        Block until `edge` on pin or `timeout` milliseconds elapsed.
+        Return pin, or None on timeout.
+        '''
+        irq, temporary = self._watch(pin, edge)
+        try:
+            return self._wait([irq], timeout)
+        finally:
+            if temporary:
+                self.remove_event_detect(pin)
+
+    def wait_for_any_edge(self, pins, edge, timeout=None):
+        '''
+        Block until `edge` on any of `pins` or `timeout` milliseconds
+        elapsed. Return the pin that fired first, or None on timeout.
+        '''
+        pins = self._listify(pins)
+        watched = []
+        try:
+            for pin in pins:
+                watched.append(self._watch(pin, edge))
+            return self._wait([irq for irq, _ in watched], timeout)
+        finally:
+            # also undoes the pins watched so far if one of them failed
+            for pin, (irq, temporary) in zip(pins, watched):
+                if temporary:
+                    self.remove_event_detect(pin)
+
+    def pulse_widths(self, pin, count=1, value=None, timeout=None):
+        '''
+        Measure `count` pulses on pin from interrupt edge timestamps and
+        return their widths in ns. Only pulses at level `value` are counted
+        if given, otherwise the time between consecutive edges, i.e. marks
+        and spaces alternately. A pulse already in progress is skipped.
+        Fewer widths are returned if `timeout` milliseconds elapsed.
+        '''
+        irq, temporary = self._watch(pin, self.BOTH)
+        widths = []
+        state = [None, None]  # start of current pulse, last level
+        flag = threading.Event()
+
+        def listener(pin_name, level, ts):
+            start, last = state
+            # same level twice means an edge was missed, restart
+            if start is not None and level != last \
+                    and (value is None or level != value):
+                widths.append(ts - start)
+                if len(widths) >= count:
+                    flag.set()
+            state[0] = ts if value is None or level == value else None
+            state[1] = level
+
+        irq.listeners.append(listener)
+        try:
+            if timeout is not None:
+                timeout = max(timeout, 0) / 1000.0
+            self._block([irq], flag, timeout)
+        finally:
+            irq.listeners.remove(listener)
+            if temporary:
+                self.remove_event_detect(pin)
+        return widths[:count]
 
     def setmode(self, mode):
-        self._mode = mode
+        GPIO._mode = mode
+        # board tables resolve to a plain mapping, skip the wrapper
+        GPIO._lookup = getattr(mode, 'table', mode)
 
     def getmode(self):
         return self._mode
 
+    def setbackend(self, backend):
+        '''
+        Select where pins live, e.g. `SysfsBackend(root='/tmp/gpio')` or
+        `SimulatedBackend()`. All pins must be cleaned up before switching.
+        '''
+        if not isinstance(backend, Backend):
+            raise ValueError('Invalid backend: {}'.format(backend))
+        if self._pin_dict:
+            raise NameError(('Pins {} are still setup with {}, please run '
+                             '`GPIO.cleanup()` first'
+                             '').format(list(self._pin_dict), self._backend))
+        GPIO._backend = backend
+
+    def getbackend(self):
+        return self._backend
+
+    def set_executor(self, executor):
+        '''
+        Run interrupt callbacks on `executor` (a CallbackExecutor) instead
+        of the interrupts handler thread. None restores inline callbacks.
+        The previous executor is returned and left running.
+        '''
+        if executor is not None and not hasattr(executor, 'submit'):
+            raise ValueError('Invalid executor: {}'.format(executor))
+        previous, GPIO._executor = self._executor, executor
+        return previous
+
+    def get_executor(self):
+        return self._executor
+
+    def stats(self):
+        '''
+        Snapshot of counters of all pins: edges, debounce rejections, edge
+        queue overflows, PWM lateness and overruns, callback executor, fd
+        pool and latency histograms if gpio4.metrics is enabled.
+        '''
+        return metrics.snapshot(self)
+
     def PWM(self, pin, frequency=None):
         '''
         if pin is already initialized before:
@@ -431,17 +635,27 @@ class GPIO(object):
                 initialize with this frequency and return PWM instance
             else:
                 initialize with 1Hz(default) and return PWM instance
+
+        Pins routed to a hardware PWM channel by the backend get a
+        _HardwarePWM, others fall back to software _PWM.
         '''
         pins = [self._get_pin_num(p) for p in self._listify(pin)]
         frequencys = self._listify(frequency, padlen=len(pins))
         return_list = []
         for p, f in zip(pins, frequencys):
             if p not in self._pwm_dict:
-                self.setup(self._listify(pin)[pins.index(p)], self.OUT)
                 if f is None:
                     raise NameError(('PWM on pin {} is not initialized yet, '
                                      'please provide pin num and freq'
                                      '').format(p))
+                hw = self._backend.pwm(p)
+                if hw is not None:
+                    # pin is muxed to a pwm controller, no gpio export
+                    self._pwm_dict[p] = _HardwarePWM(
+                        hw[0], hw[1], f, root=self._backend.pwm_root)
+                    return_list.append(self._pwm_dict[p])
+                    continue
+                self.setup(self._listify(pin)[pins.index(p)], self.OUT)
                 self._pwm_dict[p] = _PWM(self._pin_dict[p], f)
             elif f:
                 self._pwm_dict[p].ChangeFrequency(f)
@@ -452,52 +666,94 @@ class GPIO(object):
             return return_list
 
 
-class _PWM:
-    def __init__(self, sysfsgpio, frequency):
-        self._sysfsgpio = sysfsgpio
-        self.ChangeFrequency(frequency)
-        self._flag_pause = threading.Event()
-        self._flag_stop = threading.Event()
-        self._t = threading.Thread(target=self._pwm)
-        self._t.setDeamon(True)
-        self._t.start()
-
-    def _pwm(self):
-        while not self._flag_stop.isSet():
-            self._flag_pause.wait()
-            self._sysfsgpio.value = 1
-            time.sleep(self._high_time)
-            self._sysfsgpio.value = 0
-            time.sleep(self._low_time)
-
-    def start(self, dc):
-        self.ChangeDutyCycle(dc)
-        self._flag_pause.set()
-
-    def stop(self):
-        self._flag_pause.clear()
-
-    def ChangeFrequency(self, frequency):
-        if frequency <= 0:
-            raise ValueError('Invalid frequency: {}'.format(frequency))
-        self._frequency = frequency
-        self._period = 1.0/frequency
-        if hasattr(self, 'dc'):
-            self._high_time = self._dc * self._period
-            self._low_time = (1 - self._dc) * self._period
-
-    def ChangeDutyCycle(self, dc):
-        if dc > 100 or dc < 0:
-            raise ValueError('Invalid duty cycle: {}'.format(dc))
-        self._dc = float(dc) / 100
-        self._high_time = dc * self._period
-        self._low_time = (1 - dc) * self._period
+class _IRQ(object):
+    '''Interrupt record of one pin.'''
+    __slots__ = ('pin', 'pin_name', 'edge', 'gpio', 'fd', 'bouncetime',
+                 'callbacks', 'listeners', 'interrupted', 'events',
+                 'level', 'pending', 'rejected')
+
+    def __init__(self, pin, pin_name, edge, gpio, bouncetime=None,
+                 callbacks=None, events=None):
+        self.pin = pin
+        self.pin_name = pin_name
+        self.edge = edge
+        self.gpio = gpio
+        self.fd = gpio.fileno('value')
+        self.bouncetime = bouncetime or 0
+        self.callbacks = callbacks or []
+        # internal hooks called as listener(pin_name, value, timestamp)
+        self.listeners = []
+        self.interrupted = threading.Event()
+        self.events = events
+        self.level = None       # last accepted level
+        self.pending = False    # debounce re-check scheduled
+        self.rejected = 0       # edges rejected as bounce
+
+
+class _EdgeQueue(object):
+    '''
+    Bounded ring buffer of (monotonic_ns, value) edges backed by arrays.
+
+    When full the oldest edge is overwritten and `overflows` is increased.
+    '''
+    __slots__ = ('size', 'timestamps', 'values', 'head', 'count',
+                 'total', 'overflows', '_lock')
+
+    def __init__(self, size=1024):
+        if size < 1:
+            raise ValueError('Invalid queue size: {}'.format(size))
+        self.size = int(size)
+        self.timestamps = array.array('q', bytes(8 * self.size))
+        self.values = array.array('b', bytes(self.size))
+        self.head = 0   # index of oldest edge
+        self.count = 0  # edges in buffer
+        self.total = 0  # edges ever put
+        self.overflows = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def __repr__(self):
+        return '<EdgeQueue {}/{} total:{} overflows:{}>'.format(
+            self.count, self.size, self.total, self.overflows)
+
+    def put(self, timestamp, value):
+        with self._lock:
+            i = (self.head + self.count) % self.size
+            self.timestamps[i] = timestamp
+            self.values[i] = value
+            self.total += 1
+            if self.count == self.size:
+                self.head = (self.head + 1) % self.size
+                self.overflows += 1
+            else:
+                self.count += 1
+
+    def drain(self, maxlen=None):
+        if maxlen is not None and maxlen < 0:
+            raise ValueError('Invalid maxlen: {}'.format(maxlen))
+        with self._lock:
+            n = self.count if maxlen is None else min(maxlen, self.count)
+            start, end = self.head, self.head + n
+            if end <= self.size:
+                ts = self.timestamps[start:end]
+                vs = self.values[start:end]
+            else:  # wrapped around, copy two slices
+                end -= self.size
+                ts = self.timestamps[start:] + self.timestamps[:end]
+                vs = self.values[start:] + self.values[:end]
+            self.head = end % self.size
+            self.count -= n
+        return ts, vs
 
     def clear(self):
-        self.stop()
-        self._flag_stop.set()
+        with self._lock:
+            self.head = self.count = 0
 
 
-from . import arduino
+from . import arduino, metrics
 
-__all__ = ['arduino', 'constants', 'GPIO', 'SysfsGPIO']
+__all__ = ['arduino', 'constants', 'metrics', 'GPIO', 'CallbackExecutor',
+           'SysfsGPIO', 'SimulatedGPIO', 'SunxiGPIO', 'PinHandle',
+           'Backend', 'SysfsBackend', 'SimulatedBackend', 'SunxiBackend']
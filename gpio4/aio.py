@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+asyncio interface of gpio4.
+
+The epoll instance used by `GPIO` for interrupts is registered to the
+event loop with `add_reader`, so edges are dispatched in the loop thread
+and any number of pin watchers costs no extra thread:
+
+    >>> from gpio4.aio import AsyncGPIO
+    >>> async def main():
+    ...     async with AsyncGPIO() as agpio:
+    ...         await agpio.wait_for_edge('PA6', GPIO.RISING)
+    ...         async for pin, value, ts in agpio.events(['PA6', 'PA7']):
+    ...             await agpio.output('PA8', value)
+"""
+
+import asyncio
+import threading
+
+from . import GPIO
+
+
+class AsyncGPIO(object):
+    '''Drive interrupts of `gpio` (the shared GPIO state by default).'''
+
+    def __init__(self, gpio=None, loop=None):
+        self.gpio = gpio or GPIO()
+        self._loop = loop
+        self._thread_id = None
+        self._started = False
+        self._timer = None
+        self._streams = set()  # open _EdgeStreams, closed with self
+
+    def __repr__(self):
+        return '<AsyncGPIO {} at {}>'.format(
+            'started' if self._started else 'stopped', hex(id(self)))
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *a):
+        self.close()
+
+    @property
+    def loop(self):
+        if self._loop is None:
+            self._loop = asyncio.get_event_loop()
+        return self._loop
+
+    def start(self):
+        '''Register epoll of GPIO interrupts to the event loop.'''
+        if not self._started:
+            self.loop.add_reader(self.gpio._epoll.fileno(), self._on_events)
+            self._thread_id = threading.get_ident()
+            self._started = True
+
+    def close(self):
+        for stream in list(self._streams):
+            stream.close()
+        if self._started:
+            self.loop.remove_reader(self.gpio._epoll.fileno())
+            self._started = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_events(self):
+        events = self.gpio._epoll.poll(0, self.gpio._maxevents)
+        if events:
+            self.gpio._dispatch(events)
+        self._on_timer()
+
+    def _on_timer(self):
+        # debounce re-checks run on loop timers instead of sleeping
+        if self._timer is not None:
+            self._timer.cancel()
+        timeout = self.gpio._debounce()
+        self._timer = None if timeout is None else \
+            self.loop.call_later(timeout, self._on_timer)
+
+    def _call(self, func, *args):
+        # edges may also be dispatched by GPIO's interrupts handler thread
+        if threading.get_ident() == self._thread_id:
+            func(*args)
+            return
+        if self._loop is None or self._loop.is_closed():
+            return  # nobody left to deliver the event to
+        try:
+            self._loop.call_soon_threadsafe(func, *args)
+        except RuntimeError:  # loop closed meanwhile
+            pass
+
+    def _watch(self, pin, edge=None):
+        # return irq record of pin and whether it is added only for waiting
+        p = self.gpio._get_pin_num(pin, must_in_dict=True)
+        if p not in self.gpio._irq_dict:
+            if edge is None:
+                raise NameError(('Pin {} is not initialized with edge yet, '
+                                 'please provide edge').format(pin))
+            self.gpio.add_event_detect(pin, edge, queue_size=0)
+            return self.gpio._irq_dict[p], True
+        irq = self.gpio._irq_dict[p]
+        if edge is not None and edge != irq.edge:
+            raise NameError(('Pin {} is already been attached to an interrupt '
+                             'on {} edge, if you want to reset it, please run '
+                             '`GPIO.remove_event_detect({})` first'
+                             '').format(pin, irq.edge, pin))
+        return irq, False
+
+    async def wait_for_edge(self, pin, edge, timeout=None):
+        '''
+        Wait for `edge` on pin for at most `timeout` milliseconds.
+        Return pin or None on timeout.
+        '''
+        self.start()
+        irq, temporary = self._watch(pin, edge)
+        fut = self.loop.create_future()
+
+        def done(pin_name):
+            if not fut.done():
+                fut.set_result(pin_name)
+
+        def listener(pin_name, value, ts):
+            self._call(done, pin_name)
+
+        irq.listeners.append(listener)
+        try:
+            return await asyncio.wait_for(
+                fut, None if timeout is None else timeout / 1000.0)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            irq.listeners.remove(listener)
+            if temporary:
+                self.gpio.remove_event_detect(pin)
+
+    def events(self, pin, edge=None, maxsize=1024):
+        '''
+        Async iterator of (pin_name, value, monotonic_ns) edges on pin or a
+        list of pins. Pins must have event detect unless `edge` is given,
+        detects added for the stream are removed when it is closed.
+        '''
+        self.start()
+        pins = self.gpio._listify(pin)
+        watched = []
+        try:
+            for p in pins:
+                watched.append(self._watch(p, edge))
+        except Exception:
+            for p, (irq, temporary) in zip(pins, watched):
+                if temporary:
+                    self.gpio.remove_event_detect(p)
+            raise
+        stream = _EdgeStream(self, watched, pins, maxsize)
+        self._streams.add(stream)
+        return stream
+
+    async def input(self, pin):
+        # sysfs reads never block, no need to go through an executor
+        return self.gpio.input(pin)
+
+    async def output(self, pin, value):
+        self.gpio.output(pin, value)
+
+
+class _EdgeStream(object):
+    def __init__(self, agpio, watched, pins, maxsize=1024):
+        self._agpio = agpio
+        self._irqs = [irq for irq, _ in watched]
+        # event detects added for this stream only, removed on close
+        self._temporary = [p for p, (_, t) in zip(pins, watched) if t]
+        self._queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+        for irq in self._irqs:
+            irq.listeners.append(self._listener)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._irqs is None and self._queue.empty():
+            raise StopAsyncIteration
+        event = await self._queue.get()
+        if event is None:  # closed
+            raise StopAsyncIteration
+        return event
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *a):
+        self.close()
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _listener(self, pin_name, value, ts):
+        self._agpio._call(self._put, (pin_name, value, ts))
+
+    def close(self):
+        for irq in self._irqs or []:
+            irq.listeners.remove(self._listener)
+        self._irqs = None
+        for pin in self._temporary:
+            self._agpio.gpio.remove_event_detect(pin)
+        self._temporary = []
+        self._agpio._streams.discard(self)
+        try:
+            self._queue.put_nowait(None)  # wake up pending __anext__
+        except asyncio.QueueFull:
+            pass
+
+
+__all__ = ['AsyncGPIO']
@@ -7,9 +7,12 @@ Created on Tue May 15 01:17:55 2018
 @page:   https://github.com/hankso
 """
 import threading
-import time
 from gpio4.constants import *
-from gpio4 import GPIO
+from gpio4 import GPIO as _GPIO
+from gpio4.timing import monotonic_ns, sleep_ns
+from gpio4.shift import Shifter
+
+GPIO = _GPIO()
 
 
 '''
@@ -50,73 +53,65 @@ def noTone(pin):
 
 
 def pulseIn(pin, value, timeout=FOREVER_ms):
-    # wait for any previous pulse end
-    start = micros()
-    while digitalRead(pin) == value:
-        if (micros() - start) > timeout:
-            return 0
-    # wait for the pulse to start
-    while digitalRead(pin) != value:
-        if (micros() - start) > timeout:
-            return 0
-    start = micros()
-    # wait for the pulse to end
-    while digitalRead(pin) == value:
-        if (micros() - start) > timeout:
-            return 0
-    return micros() - start
-
-
-def shiftIn(dataPin, clockPin, bitOrder):
-    digitalWrite(clockPin, LOW)
-    value = 0
-    if bitOrder == MSBFIRST:
-        for i in range(8):
-            digitalWrite(clockPin, HIGH)
-            value |= digitalRead(dataPin) << (7 - i)
-            digitalWrite(clockPin, LOW)
-    elif bitOrder == LSBFIRST:
-        for i in range(8):
-            digitalWrite(clockPin, HIGH)
-            value |= digitalRead(dataPin) << i
-            digitalWrite(clockPin, LOW)
-    else:
-        raise ValueError('Invalid bitOrder: {}'.format(bitOrder))
-    return value
+    '''
+    Length of the next pulse at `value` on pin in microseconds, 0 if none
+    completed within `timeout` microseconds. Measured from interrupt edge
+    timestamps, no CPU is spent while waiting.
+    '''
+    widths = GPIO.pulse_widths(pin, 1, value, timeout / 1000.0)
+    return widths[0] // 1000 if widths else 0
+
+
+def pulseTrain(pin, count, timeout=FOREVER_ms, value=None):
+    '''
+    Lengths of the next `count` pulses on pin in microseconds: marks and
+    spaces alternately, or only pulses at `value` if given. Fewer are
+    returned if `timeout` microseconds elapsed.
+    '''
+    return [w // 1000 for w in
+            GPIO.pulse_widths(pin, count, value, timeout / 1000.0)]
+
+
+def shiftIn(dataPin, clockPin, bitOrder, size=None):
+    '''
+    Shift in one byte, or a bytearray of `size` bytes if size is given.
+    '''
+    rx = Shifter(clockPin, miso=dataPin, bit_order=bitOrder,
+                 gpio=GPIO).read(1 if size is None else size)
+    return rx[0] if size is None else rx
 
 
 def shiftOut(dataPin, clockPin, bitOrder, value):
-    if bitOrder == MSBFIRST:
-        for i in range(8):
-            digitalWrite(clockPin, LOW)
-            digitalWrite(dataPin, value & (1 << (7 - i)))
-            digitalWrite(clockPin, HIGH)
-    elif bitOrder == LSBFIRST:
-        for i in range(8):
-            digitalWrite(clockPin, LOW)
-            digitalWrite(dataPin, value & (1 << i))
-            digitalWrite(clockPin, HIGH)
-    else:
-        raise ValueError('Invalid bitOrder: {}'.format(bitOrder))
+    '''
+    Shift out one byte, or every byte of a bytes/bytearray/memoryview.
+    '''
+    if isinstance(value, int):
+        value = bytes([value & 0xff])
+    Shifter(clockPin, mosi=dataPin, bit_order=bitOrder,
+            gpio=GPIO).write(value)
 
 
 '''
 Time
 '''
+_start = monotonic_ns()
+
+
 def delay(timeout):
-    time.sleep(timeout/1000.0)
+    sleep_ns(int(timeout * 1000000))
 
 
 def delayMicroseconds(timeout):
-    time.sleep(timeout/1000000.0)
+    # sleep then spin on an absolute deadline, accurate below 100us
+    sleep_ns(int(timeout * 1000))
 
 
 def micros():
-    return time.time() * 1000
+    return (monotonic_ns() - _start) // 1000
 
 
 def millis():
-    return time.time() * 1000000
+    return (monotonic_ns() - _start) // 1000000
 
 
 '''
@@ -165,7 +160,7 @@ def lowByte(x):
 External Interrupts
 '''
 def attachInterrupt(pin, ISR, mode):
-    GPIO.add_event_detect(pin, edge=mode, callback=[ISR])
+    GPIO.add_event_detect(pin, edge=mode, func=[ISR])
 
 
 def detachInterrupt(pin):
@@ -184,7 +179,7 @@ def noInterrupts():
 __all__ = ['HIGH', 'LOW', 'OUTPUT', 'INPUT', 'INPUT_PULLUP', 'INPUT_PULLDN',
            'MSBFIRST', 'LSBFIRST', 'true', 'false',
            'pinMode', 'digitalWrite', 'digitalRead', 'tone', 'noTone',
-           'pulseIn', 'shiftIn', 'shiftOut', 'constrain', 'map',
+           'pulseIn', 'pulseTrain', 'shiftIn', 'shiftOut', 'constrain', 'map',
            'delay', 'delayMicroseconds', 'micros', 'millis',
            'bitClear', 'bitSet', 'bitRead', 'bitWrite', 'highByte', 'lowByte',
            'attachInterrupt', 'detachInterrupt', 'interrupts', 'noInterrupts']
@@ -0,0 +1,891 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pin backends used by `gpio4.GPIO`.
+
+A backend knows how to turn a gpio number into a pin object. Every pin
+object provides the same interface as `SysfsGPIO`: `export`, `value`,
+`direction`, `active_low`, `edge` attributes, `refresh()` to drop cached
+attributes, `fileno()` returning a descriptor that can be registered to
+epoll with `poll_events` and `acknowledge()` which clears a pending
+interrupt and returns the level.
+
+    - SysfsBackend: pins in /sys/class/gpio (or any directory tree that
+      looks like it, e.g. a scratch tree for testing)
+
+    - SimulatedBackend: pins that only live in memory, edges can be
+      injected by hand or at a fixed rate to load test the dispatcher
+
+    - SunxiBackend: pins of Allwinner SoCs driven through the memory
+      mapped PIO registers, no syscall per access
+"""
+
+import os
+import time
+import errno
+import mmap
+import select
+import threading
+
+from . import fdpool
+from .timing import monotonic_ns
+
+
+# pre-encoded payloads of value attribute, True/False hash as 1/0
+_PAYLOAD = {0: b'0', 1: b'1', '0': b'0', '1': b'1', b'0': b'0', b'1': b'1'}
+_LEVEL = {b'0': 0, b'1': 1}
+
+
+def _wait_access(paths, timeout=1.0):
+    # udev fixes permissions of new nodes shortly after export, wait for
+    # all of them at once with bounded backoff instead of racing it
+    delay, deadline = 0.001, time.monotonic() + timeout
+    pending = list(paths)
+    while True:
+        pending = [p for p in pending if not os.access(p, os.R_OK | os.W_OK)]
+        if not pending or time.monotonic() >= deadline:
+            return not pending
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+
+def _is_scratch(root):
+    # scratch trees are plain files, stale bytes must be truncated
+    return not os.path.realpath(root).startswith('/sys/')
+
+
+def _unexport(root, pins):
+    # best effort rollback of a failed export
+    for pin in pins:
+        try:
+            with open(os.path.join(root, 'unexport'), 'w') as f:
+                f.write(str(pin))
+        except (IOError, OSError):
+            pass
+
+
+def _inaccessible(root, gpios, timeout):
+    stuck = [g.pin for g in gpios if not _wait_access(g.nodes(), 0)]
+    _unexport(root, [g.pin for g in gpios])
+    return OSError(errno.EACCES, 'Gpio {} not accessible after {}s'.format(
+        ', '.join(str(p) for p in stuck), timeout), root)
+
+
+class _Fds(dict):
+    '''Pinned attribute fds of a sysfs pin, pinned on first `fileno()`.'''
+
+    def __init__(self, path, pool, owner):
+        dict.__init__(self)
+        self.path = path
+        self.pool = pool
+        self.owner = owner
+
+    def __missing__(self, attr):
+        fd = self[attr] = self.pool.pin(os.path.join(self.path, attr),
+                                        self.owner)
+        return fd
+
+    def release(self):
+        # other pin objects of the same gpio keep their references
+        for attr in list(self):
+            self.pool.release(os.path.join(self.path, attr), self.owner)
+        self.clear()
+
+
+class SysfsGPIO(object):
+    '''
+    Attribute files are accessed through raw file descriptors with
+    positional os.pread/os.pwrite, there is no shared file offset so no
+    lock is needed and every access costs exactly one syscall. The value
+    fd is pinned in `pool` (see gpio4.fdpool) once the pin is hot or its
+    fd is requested by `fileno()`. Until then, and for configuration
+    attributes, fds are cached by the pool within its budget.
+
+    direction, edge, active_low and the last value written to an output
+    are shadowed on write, so reading them back costs no syscall at all.
+    Call `refresh()` if another process may have changed them.
+    '''
+    attributes = ('value', 'direction', 'active_low', 'edge')
+    poll_events = select.EPOLLPRI | select.EPOLLET
+
+    def __init__(self, pin, root='/sys/class/gpio', pool=None):
+        self.pin = int(pin)
+        self.root = root
+        self.path = os.path.join(root, 'gpio{:d}'.format(self.pin))
+        self._truncate = _is_scratch(root)
+        self.pool = pool or fdpool.pool
+        self._fd = _Fds(self.path, self.pool, self)
+        self._cold = 0  # value accesses through the pool so far
+        # reusable buffer for value reads. Concurrent readers may see each
+        # other's byte, which is a sample of the same line at the same time
+        self._buf = bytearray(4)
+        self._bufs = [self._buf]
+        self._shadow = {}
+        self._is_out = False
+        self._out = None  # last level written to an output pin
+
+    def __repr__(self):
+        if self.export:
+            return '<gpio{} {} edge:{} mode:{} at {}>'.format(
+                self.pin, 'HIGH' if self.value else 'LOW', self.edge.title(),
+                self.direction.upper(), hex(self.__hash__()))
+        else:
+            return '<gpio{} unexported at {}>'.format(
+                self.pin, hex(self.__hash__()))
+
+    @property
+    def export(self):
+        return os.path.exists(self.path)
+
+    @property
+    def value(self):
+        if self._out is not None:
+            return self._out
+        return self._read_value()
+
+    @property
+    def direction(self):
+        return self._cached('direction')
+
+    @property
+    def active_low(self):
+        return self._cached('active_low')
+
+    @property
+    def edge(self):
+        return self._cached('edge')
+
+    @export.setter
+    def export(self, value):
+        # open or reopen attr files
+        # gpio pin will be registed if it is not yet
+        if value:
+            if not self.export:
+                with open(os.path.join(self.root, 'export'), 'w') as f:
+                    f.write(str(self.pin))
+                if not _wait_access(self.nodes()):
+                    raise _inaccessible(self.root, [self], 1.0)
+            self._close()
+        # close attr files
+        # gpio will be unexported if it exists
+        else:
+            if self.export:
+                with open(os.path.join(self.root, 'unexport'), 'w') as f:
+                    f.write(str(self.pin))
+            self._close()
+
+    @value.setter
+    def value(self, data):
+        try:
+            payload = _PAYLOAD[data]
+        except (KeyError, TypeError):
+            self._write('value', data)
+            self._out = None
+            return
+        fd = self._fd.get('value')
+        if fd is None:
+            fd = self._hot()
+        if fd is None:
+            self.pool.pwrite(os.path.join(self.path, 'value'), payload)
+        else:
+            os.pwrite(fd, payload, 0)
+        if self._is_out:
+            self._out = _LEVEL[payload]
+
+    @direction.setter
+    def direction(self, data):
+        self._write('direction', data)
+        # 'high' and 'low' configure an output with initial raw level,
+        # shadowed only if active_low is known (None: read back on demand)
+        self._out = None
+        if data in ('high', 'low'):
+            active_low = self._shadow.get('active_low')
+            if active_low is not None:
+                self._out = int(data == 'high') ^ active_low
+            data = 'out'
+        self._shadow['direction'] = data
+        self._is_out = data == 'out'
+
+    @active_low.setter
+    def active_low(self, data):
+        self._write('active_low', data)
+        self._shadow['active_low'] = int(bool(int(data)))
+        self._out = None  # inverted meaning of the cached level
+
+    @edge.setter
+    def edge(self, data):
+        self._write('edge', data)
+        self._shadow['edge'] = data
+
+    def refresh(self):
+        '''Drop shadowed attributes, they are read again on next access.'''
+        self._forget()
+
+    def fileno(self, attr='value'):
+        return self._fd[attr]
+
+    def nodes(self):
+        '''Paths that must be accessible before the pin can be used.'''
+        return [os.path.join(self.path, attr)
+                for attr in ('value', 'direction')]
+
+    def _close(self):
+        # fds opened before a re-export refer to stale nodes
+        self._fd.release()
+        self._cold = 0
+        self.pool.close_all(os.path.join(self.path, attr)
+                            for attr in self.attributes)
+        self._forget()
+
+    def acknowledge(self):
+        # kernel doc: after poll(2) returns, lseek(2) to the beginning
+        # of the sysfs file and read the new value
+        return self._read_value()
+
+    def _forget(self):
+        self._shadow.clear()
+        self._is_out = False
+        self._out = None
+
+    def _cached(self, attr):
+        try:
+            return self._shadow[attr]
+        except KeyError:
+            value = self._read(attr)
+            if attr == 'active_low':  # same type as shadowed by the setter
+                value = int(value)
+            self._shadow[attr] = value
+            if attr == 'direction':
+                self._is_out = value == 'out'
+            return value
+
+    def _hot(self):
+        # count accesses of an unpinned value fd, pin it when it gets hot
+        self._cold += 1
+        if self._cold < self.pool.hot:
+            return None
+        fd = self.pool.pin(os.path.join(self.path, 'value'), self,
+                           required=False)
+        if fd is not None:
+            self._fd['value'] = fd
+        return fd
+
+    def _read_value(self):
+        fd = self._fd.get('value')
+        if fd is None:
+            fd = self._hot()
+        if fd is None:
+            data = self.pool.pread(os.path.join(self.path, 'value'), 4)
+            if not data:
+                raise ValueError('Empty value of gpio{}'.format(self.pin))
+            return data[0] - 48  # ord('0')
+        if not os.preadv(fd, self._bufs, 0):
+            raise ValueError('Empty value of gpio{}'.format(self.pin))
+        return self._buf[0] - 48  # ord('0')
+
+    def _read(self, attr):
+        path = os.path.join(self.path, attr)
+        return self.pool.pread(path).strip().decode('utf-8')
+
+    def _write(self, attr, data):
+        self.pool.pwrite(os.path.join(self.path, attr),
+                         str(data).encode('utf-8'), self._truncate)
+
+
+class SimulatedGPIO(object):
+    '''
+    In-memory pin with the same interface as SysfsGPIO.
+
+    `fileno()` returns the read end of a pipe, one byte is written to it
+    on every edge that matches `edge`, so GPIO's epoll dispatcher works
+    without any kernel support.
+    '''
+    attributes = SysfsGPIO.attributes
+    poll_events = select.EPOLLIN
+
+    def __init__(self, pin, backend=None):
+        self.pin = int(pin)
+        self.backend = backend
+        self.direction = 'in'
+        self.active_low = 0
+        self.edge = 'none'
+        self._level = 0
+        self._export = False
+        self._pipe = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        if self.export:
+            return '<simulated gpio{} {} edge:{} mode:{} at {}>'.format(
+                self.pin, 'HIGH' if self.value else 'LOW', self.edge.title(),
+                self.direction.upper(), hex(self.__hash__()))
+        else:
+            return '<simulated gpio{} unexported at {}>'.format(
+                self.pin, hex(self.__hash__()))
+
+    @property
+    def export(self):
+        return self._export
+
+    @export.setter
+    def export(self, value):
+        if value and not self._export:
+            self._pipe = os.pipe()
+            for fd in self._pipe:
+                os.set_blocking(fd, False)
+        elif not value and self._export:
+            for fd in self._pipe:
+                os.close(fd)
+            self._pipe = None
+        self._export = bool(value)
+
+    @property
+    def value(self):
+        return self._level ^ int(self.active_low)
+
+    @value.setter
+    def value(self, data):
+        self._level = int(bool(int(data))) ^ int(self.active_low)
+
+    def fileno(self, attr='value'):
+        if self._pipe is None:
+            raise KeyError(attr)
+        return self._pipe[0]
+
+    def refresh(self):
+        pass
+
+    def acknowledge(self):
+        try:
+            while os.read(self._pipe[0], 4096):
+                pass
+        except (OSError, TypeError):
+            pass
+        return self.value
+
+    def drive(self, level):
+        '''Drive the line from outside like real hardware would.'''
+        with self._lock:
+            old, self._level = self._level, int(bool(level))
+            if old == self._level or self._pipe is None:
+                return
+            value = self.value
+            if (
+                self.edge == 'both' or
+                (self.edge == 'rising' and value) or
+                (self.edge == 'falling' and not value)
+            ):
+                try:
+                    os.write(self._pipe[1], b'\x01')
+                except OSError:  # pipe full, edges are coalesced
+                    pass
+
+
+class SunxiGPIO(object):
+    '''
+    Pin of an Allwinner PIO bank, see `SunxiBackend`.
+
+    Pin number follows `constants.BOARD_SUNXI`: 32 * bank + index, e.g.
+    PA6 is 6 and PC4 is 68. `active_low` is emulated in software and no
+    edge other than 'none' is supported, use SysfsBackend for interrupts.
+    '''
+    attributes = SysfsGPIO.attributes
+    poll_events = 0
+
+    def __init__(self, pin, backend):
+        self.pin = int(pin)
+        self.backend = backend
+        self.bank, self.index = divmod(self.pin, 32)
+        self.mask = 1 << self.index
+        self.active_low = 0
+        self._export = False
+        self._dat = backend._reg(self.bank, SunxiBackend.DAT)
+
+    def __repr__(self):
+        if self.export:
+            return '<sunxi P{}{} {} mode:{} at {}>'.format(
+                chr(65 + self.bank), self.index,
+                'HIGH' if self.value else 'LOW',
+                self.direction.upper(), hex(self.__hash__()))
+        else:
+            return '<sunxi P{}{} unexported at {}>'.format(
+                chr(65 + self.bank), self.index, hex(self.__hash__()))
+
+    @property
+    def export(self):
+        return self._export
+
+    @export.setter
+    def export(self, value):
+        self._export = bool(value)
+
+    @property
+    def value(self):
+        level = (self.backend._words[self._dat] >> self.index) & 1
+        return level ^ int(self.active_low)
+
+    @value.setter
+    def value(self, data):
+        level = int(bool(int(data))) ^ int(self.active_low)
+        self.backend._modify(self._dat, self.mask, level << self.index)
+
+    @property
+    def direction(self):
+        func = self.backend.get_function(self.pin)
+        return {SunxiBackend.INPUT: 'in', SunxiBackend.OUTPUT: 'out'}.get(
+            func, 'func{}'.format(func))
+
+    @direction.setter
+    def direction(self, data):
+        # sysfs semantics: 'high' and 'low' set output with initial level
+        if data in ('high', 'low'):
+            self.value = int(data == 'high') ^ int(self.active_low)
+            data = 'out'
+        if data not in ('in', 'out'):
+            raise ValueError('Invalid direction: {}'.format(data))
+        self.backend.set_function(self.pin, SunxiBackend.OUTPUT
+                                  if data == 'out' else SunxiBackend.INPUT)
+
+    @property
+    def edge(self):
+        return 'none'
+
+    @edge.setter
+    def edge(self, data):
+        if data != 'none':
+            raise ValueError(('Edge {} is not supported by memory mapped '
+                              'registers, use SysfsBackend instead'
+                              '').format(data))
+
+    @property
+    def pull(self):
+        return self.backend.get_pull(self.pin)
+
+    @pull.setter
+    def pull(self, data):
+        self.backend.set_pull(self.pin, data)
+
+    def fileno(self, attr='value'):
+        raise KeyError('{} of {} has no file descriptor'.format(attr, self))
+
+    def refresh(self):
+        pass
+
+    def acknowledge(self):
+        return self.value
+
+
+class _Released(object):
+    '''Stands in for the pin of an invalidated handle.'''
+    _out = None
+    _is_out = False
+
+    def __init__(self, name):
+        self.name = name
+
+    def _fail(self, *a):
+        raise NameError(('Pin {} has been cleaned up, please run '
+                         '`GPIO.setup({}, state)` and get a new handle'
+                         '').format(self.name, self.name))
+
+    value = property(_fail, _fail)
+
+
+class PinHandle(object):
+    '''
+    Pin bound once by `GPIO.pin(name)`: no name lookup, no argument
+    listifying per call. Invalidated by `GPIO.cleanup()`.
+    '''
+    __slots__ = ('name', '_pin')
+
+    def __init__(self, name, pin):
+        self.name = name
+        self._pin = pin
+
+    def __repr__(self):
+        return '<{} {} of {}>'.format(
+            type(self).__name__, self.name,
+            'released' if not self.valid else self._pin)
+
+    @property
+    def valid(self):
+        return not isinstance(self._pin, _Released)
+
+    def invalidate(self):
+        self._pin = _Released(self.name)
+
+    def read(self):
+        return self._pin.value
+
+    def write(self, value):
+        if value not in _PAYLOAD:
+            raise ValueError('Invalid value: {}'.format(value))
+        self._pin.value = int(value)
+
+    def high(self):
+        self._pin.value = 1
+
+    def low(self):
+        self._pin.value = 0
+
+    def toggle(self):
+        '''Invert the level and return the new one.'''
+        level = self._pin.value ^ 1
+        self._pin.value = level
+        return level
+
+
+class SysfsHandle(PinHandle):
+    '''
+    PinHandle of a SysfsGPIO that talks to the value fd directly with
+    pre-encoded payloads, i.e. one syscall per access and no property.
+    An invalidated handle holds fd -1, so no check is needed on success.
+    '''
+    __slots__ = ('_fd', '_buf', '_bufs')
+
+    def __init__(self, name, pin):
+        PinHandle.__init__(self, name, pin)
+        self._fd = pin.fileno()
+        self._buf, self._bufs = pin._buf, pin._bufs
+
+    def invalidate(self):
+        PinHandle.invalidate(self)
+        self._fd = -1
+
+    def _error(self):
+        if self._fd < 0:
+            self._pin.value  # raise NameError of released pin
+
+    def read(self):
+        out = self._pin._out
+        if out is not None:
+            return out
+        try:
+            os.preadv(self._fd, self._bufs, 0)
+        except OSError:
+            self._error()
+            raise
+        return self._buf[0] - 48  # ord('0')
+
+    def write(self, value):
+        try:
+            payload = _PAYLOAD[value]
+        except (KeyError, TypeError):
+            raise ValueError('Invalid value: {}'.format(value))
+        try:
+            os.pwrite(self._fd, payload, 0)
+        except OSError:
+            self._error()
+            raise
+        if self._pin._is_out:
+            self._pin._out = _LEVEL[payload]
+
+    def high(self):
+        try:
+            os.pwrite(self._fd, b'1', 0)
+        except OSError:
+            self._error()
+            raise
+        if self._pin._is_out:
+            self._pin._out = 1
+
+    def low(self):
+        try:
+            os.pwrite(self._fd, b'0', 0)
+        except OSError:
+            self._error()
+            raise
+        if self._pin._is_out:
+            self._pin._out = 0
+
+    def toggle(self):
+        level = self.read() ^ 1
+        self.write(level)
+        return level
+
+
+class Backend(object):
+    '''Interface of all backends.'''
+
+    name = None
+
+    def gpio(self, pin):
+        '''Return a pin object for gpio number `pin`.'''
+        raise NotImplementedError
+
+    def export(self, gpios):
+        '''Export a batch of pin objects.'''
+        for gpio in gpios:
+            gpio.export = True
+
+    def pwm(self, pin):
+        '''Return (pwmchip, channel) routed to gpio `pin` or None.'''
+        return None
+
+    def close(self):
+        pass
+
+
+class SysfsBackend(Backend):
+    '''
+    Pins exported through the sysfs gpio interface.
+
+    `root` defaults to /sys/class/gpio and can point to any directory tree
+    with the same layout, e.g. a scratch tree to benchmark against.
+
+    `pwm_map` maps gpio numbers to (pwmchip, channel) of hardware PWM
+    under `pwm_root`, e.g. {18: (0, 0), 19: (0, 1)} on a Raspberry Pi with
+    the pwm-2chan overlay. GPIO.PWM uses them instead of software PWM.
+    '''
+
+    name = 'sysfs'
+
+    def __init__(self, root='/sys/class/gpio', pwm_map=None,
+                 pwm_root='/sys/class/pwm'):
+        self.root = root
+        self.pwm_map = dict(pwm_map or {})
+        self.pwm_root = pwm_root
+
+    def __repr__(self):
+        return '<SysfsBackend at {}>'.format(self.root)
+
+    def gpio(self, pin):
+        return SysfsGPIO(pin, root=self.root)
+
+    def export(self, gpios, timeout=1.0):
+        '''
+        Write all pins to the export file first, then wait once (at most
+        `timeout` seconds) until all of their nodes are accessible. On
+        failure, pins exported so far are unexported again and OSError is
+        raised, so the batch is all or nothing.
+        '''
+        new = [g for g in gpios if not g.export]
+        if new:
+            done = []
+            fd = os.open(os.path.join(self.root, 'export'), os.O_WRONLY)
+            try:
+                for gpio in new:
+                    os.write(fd, str(gpio.pin).encode('utf-8'))
+                    done.append(gpio.pin)
+            except OSError:
+                _unexport(self.root, done)
+                raise
+            finally:
+                os.close(fd)
+            if not _wait_access([n for g in new for n in g.nodes()], timeout):
+                raise _inaccessible(self.root, new, timeout)
+        for gpio in gpios:
+            gpio.export = True  # already exported, only resets state
+
+    def pwm(self, pin):
+        chip = self.pwm_map.get(int(pin))
+        if chip is None:
+            return None
+        if not os.path.isdir(os.path.join(
+                self.pwm_root, 'pwmchip{:d}'.format(chip[0]))):
+            return None
+        return chip
+
+
+class SimulatedBackend(Backend):
+    '''
+    Pins that only live in memory.
+
+    Use `inject(pin, level)` to drive an input line by hand or
+    `start_events(pins, rate)` to toggle lines at `rate` edges per second
+    from a background thread.
+    '''
+
+    name = 'simulated'
+
+    def __init__(self):
+        self._pins = {}
+        self._flag_stop = threading.Event()
+        self._thread = None
+        self.injected = 0
+
+    def __repr__(self):
+        return '<SimulatedBackend with {} pins>'.format(len(self._pins))
+
+    def gpio(self, pin):
+        pin = int(pin)
+        if pin not in self._pins:
+            self._pins[pin] = SimulatedGPIO(pin, self)
+        return self._pins[pin]
+
+    def inject(self, pin, level):
+        self.gpio(pin).drive(level)
+        self.injected += 1
+
+    def toggle(self, pin):
+        self.inject(pin, not self.gpio(pin)._level)
+
+    def start_events(self, pins, rate, count=None):
+        '''
+        Toggle `pins` in turn at `rate` edges per second, until `count`
+        edges are generated or `stop_events` is called.
+        '''
+        if rate <= 0:
+            raise ValueError('Invalid rate: {}'.format(rate))
+        self.stop_events()
+        if not isinstance(pins, (list, tuple)):
+            pins = [pins]
+        self._flag_stop.clear()
+        self._thread = threading.Thread(
+            target=self._generate, args=(list(pins), rate, count))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop_events(self):
+        self._flag_stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _generate(self, pins, rate, count):
+        # absolute monotonic deadlines, immune to wall clock steps and
+        # without drift from rounding the interval
+        start = monotonic_ns()
+        n = 0
+        while not self._flag_stop.is_set():
+            if count is not None and n >= count:
+                break
+            self.toggle(pins[n % len(pins)])
+            n += 1
+            delay = start + int(n * 1e9 / rate) - monotonic_ns()
+            if delay > 0:
+                self._flag_stop.wait(delay / 1e9)
+
+    def close(self):
+        self.stop_events()
+        for pin in self._pins.values():
+            pin.export = False
+        self._pins.clear()
+
+
+class SunxiBackend(Backend):
+    '''
+    Allwinner PIO registers mapped into memory.
+
+    Each bank (PA, PB, ...) takes 0x24 bytes starting from `base`:
+
+        0x00-0x0C CFG0-CFG3  4 bits function per pin, 0 input, 1 output
+        0x10      DAT        1 bit level per pin
+        0x14-0x18 DRV0-DRV1  2 bits drive strength per pin
+        0x1C-0x20 PUL0-PUL1  2 bits pull per pin, 0 none, 1 up, 2 down
+
+    `path` defaults to /dev/mem and `base` to the PIO block of A10/A20/H3
+    (0x01C20800). Any regular file can be used as a register image with
+    base=0, e.g. `SunxiBackend(SunxiBackend.make_image('/tmp/pio'), 0)`,
+    which is handy to verify bit-level logic without a board.
+    '''
+
+    name = 'sunxi'
+    BANK_SIZE = 0x24
+    CFG, DAT, DRV, PUL = 0x00, 0x10, 0x14, 0x1C
+    INPUT, OUTPUT, DISABLE = 0, 1, 7
+    PULL = {'none': 0, 'up': 1, 'down': 2}
+    BANKS = 9  # PA - PI
+
+    def __init__(self, path='/dev/mem', base=0x01C20800, size=None):
+        size = size or self.BANK_SIZE * self.BANKS
+        start = base & ~(mmap.PAGESIZE - 1)
+        length = base - start + size
+        length += -length % mmap.PAGESIZE
+        fd = os.open(path, os.O_RDWR | os.O_SYNC)
+        try:
+            self._mmap = mmap.mmap(fd, length, mmap.MAP_SHARED,
+                                   mmap.PROT_READ | mmap.PROT_WRITE,
+                                   offset=start)
+        finally:
+            os.close(fd)
+        self._words = memoryview(self._mmap).cast('I')
+        self._offset = base - start
+        self._lock = threading.Lock()
+        self._pins = {}
+        self.path = path
+        self.base = base
+
+    def __repr__(self):
+        return '<SunxiBackend at {}+{:#x}>'.format(self.path, self.base)
+
+    @classmethod
+    def make_image(cls, path, size=None):
+        '''Create a zeroed register image file at `path`.'''
+        size = size or cls.BANK_SIZE * cls.BANKS
+        size += -size % mmap.PAGESIZE
+        with open(path, 'wb') as f:
+            f.truncate(size)
+        return path
+
+    def gpio(self, pin):
+        pin = int(pin)
+        if pin // 32 >= self.BANKS:
+            raise KeyError('Pin {} is out of bank PA - P{}'.format(
+                pin, chr(64 + self.BANKS)))
+        if pin not in self._pins:
+            self._pins[pin] = SunxiGPIO(pin, self)
+        return self._pins[pin]
+
+    def _bank(self, bank):
+        if not isinstance(bank, int):
+            bank = ord(str(bank).upper().lstrip('P')) - 65
+        if not 0 <= bank < self.BANKS:
+            raise KeyError('Invalid bank: {}'.format(bank))
+        return bank
+
+    def _reg(self, bank, offset):
+        # index of a 32 bits register in self._words
+        return (self._offset + self._bank(bank) * self.BANK_SIZE + offset) // 4
+
+    def _modify(self, reg, mask, bits):
+        with self._lock:
+            self._words[reg] = (self._words[reg] & ~mask) | (bits & mask)
+
+    def _field(self, pin, offset, width):
+        bank, index = divmod(int(pin), 32)
+        per_reg = 32 // width
+        reg = self._reg(bank, offset + index // per_reg * 4)
+        return reg, (index % per_reg) * width, (1 << width) - 1
+
+    def get_function(self, pin):
+        reg, shift, mask = self._field(pin, self.CFG, 4)
+        return (self._words[reg] >> shift) & mask
+
+    def set_function(self, pin, func):
+        reg, shift, mask = self._field(pin, self.CFG, 4)
+        self._modify(reg, mask << shift, int(func) << shift)
+
+    def get_pull(self, pin):
+        reg, shift, mask = self._field(pin, self.PUL, 2)
+        bits = (self._words[reg] >> shift) & mask
+        for name, value in self.PULL.items():
+            if value == bits:
+                return name
+        return bits
+
+    def set_pull(self, pin, pull):
+        if pull not in self.PULL:
+            raise ValueError('Invalid pull: {}'.format(pull))
+        reg, shift, mask = self._field(pin, self.PUL, 2)
+        self._modify(reg, mask << shift, self.PULL[pull] << shift)
+
+    def read_port(self, bank):
+        '''Levels of all 32 pins of a bank as a bitmask.'''
+        return self._words[self._reg(bank, self.DAT)]
+
+    def write_port(self, bank, value, mask=0xFFFFFFFF):
+        '''Set pins selected by `mask` of a bank in one register write.'''
+        self._modify(self._reg(bank, self.DAT), mask, value)
+
+    def close(self):
+        self._pins.clear()
+        if self._mmap is not None:
+            self._words.release()
+            self._mmap.close()
+            self._mmap = None
+
+
+__all__ = ['Backend', 'SysfsBackend', 'SimulatedBackend', 'SunxiBackend',
+           'SysfsGPIO', 'SimulatedGPIO', 'SunxiGPIO',
+           'PinHandle', 'SysfsHandle']
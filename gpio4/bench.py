@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of gpio4 hot paths.
+
+    $ python -m gpio4.bench -n 10000 -o result.json
+    $ gpio4-bench --only sysfs gpio
+
+Pin I/O is measured against a fake sysfs directory tree (a temporary one
+is created unless `--root` is given), interrupts against the simulated
+backend because epoll does not work on plain files. Results are printed
+as JSON so they can be compared between releases.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+
+from . import GPIO, SysfsBackend, SimulatedBackend, SysfsGPIO, _PWM, arduino
+
+DATA, CLOCK, IRQ = 1, 2, 3
+PINS = (DATA, CLOCK, IRQ)
+
+
+def make_fake_sysfs(root, pins=PINS):
+    '''Create a directory tree that looks like /sys/class/gpio.'''
+    for fn in ('export', 'unexport'):
+        open(os.path.join(root, fn), 'a').close()
+    for pin in pins:
+        path = os.path.join(root, 'gpio{:d}'.format(pin))
+        if not os.path.exists(path):
+            os.makedirs(path)
+        for attr, default in zip(SysfsGPIO.attributes,
+                                 ('0', 'in', '0', 'none')):
+            with open(os.path.join(path, attr), 'w') as f:
+                f.write(default + '\n')
+    return root
+
+
+def _rate(func, number):
+    t = time.perf_counter()
+    for _ in range(number):
+        func()
+    t = time.perf_counter() - t
+    return {
+        'ops': number, 'seconds': t,
+        'ops_per_sec': number / t, 'ns_per_op': t / number * 1e9
+    }
+
+
+def _stats(samples, scale=1e6):
+    # samples in seconds, statistics in microseconds by default
+    if not samples:
+        return {'count': 0}
+    samples = sorted(s * scale for s in samples)
+    n = len(samples)
+    mean = sum(samples) / n
+    var = sum((s - mean) ** 2 for s in samples) / n
+    return {
+        'count': n, 'mean': mean, 'stdev': var ** 0.5,
+        'min': samples[0], 'p50': samples[n // 2],
+        'p99': samples[min(n - 1, int(n * 0.99))], 'max': samples[-1]
+    }
+
+
+class _Session(object):
+    '''Point GPIO to a backend and restore everything afterwards.'''
+
+    def __init__(self, backend):
+        self.gpio = GPIO()
+        self.backend = backend
+
+    def __enter__(self):
+        self._backend = self.gpio.getbackend()
+        self._mode = self.gpio.getmode()
+        self.gpio.setbackend(self.backend)
+        self.gpio.setmode({p: p for p in PINS})
+        return self.gpio
+
+    def __exit__(self, *a):
+        self.gpio.close_interrupts()
+        self.gpio.cleanup()
+        self.gpio.setbackend(self._backend)
+        self.gpio.setmode(self._mode)
+
+
+def bench_sysfs(root, number):
+    '''Raw `SysfsGPIO.value` writes and reads.'''
+    out, inp = SysfsGPIO(DATA, root=root), SysfsGPIO(CLOCK, root=root)
+    out.export = inp.export = True
+    out.direction, inp.direction = 'out', 'in'
+    try:
+        write = _rate(lambda: setattr(out, 'value', 1), number)
+        # outputs return the shadowed level, read an input to hit sysfs
+        read = _rate(lambda: inp.value, number)
+    finally:
+        out.export = inp.export = False
+    return {'write': write, 'read': read}
+
+
+def bench_gpio(root, number):
+    '''`GPIO.output` / `GPIO.input` / `GPIO.pin` and overhead over SysfsGPIO.'''
+    raw = bench_sysfs(root, number)
+    with _Session(SysfsBackend(root)) as gpio:
+        gpio.setup(DATA, GPIO.OUT)
+        gpio.setup(CLOCK, GPIO.IN)
+        output = _rate(lambda: gpio.output(DATA, 1), number)
+        input = _rate(lambda: gpio.input(CLOCK), number)
+        handle = _rate(gpio.pin(DATA).high, number)
+    output['overhead_ns'] = output['ns_per_op'] - raw['write']['ns_per_op']
+    input['overhead_ns'] = input['ns_per_op'] - raw['read']['ns_per_op']
+    handle['overhead_ns'] = handle['ns_per_op'] - raw['write']['ns_per_op']
+    return {'output': output, 'input': input, 'handle': handle}
+
+
+def bench_shiftout(root, number):
+    '''`arduino.shiftOut` of one byte.'''
+    number = max(1, number // 16)  # 16 writes per byte
+    with _Session(SysfsBackend(root)):
+        arduino.pinMode([DATA, CLOCK], arduino.OUTPUT)
+        rst = _rate(
+            lambda: arduino.shiftOut(DATA, CLOCK, arduino.MSBFIRST, 0xA5),
+            number)
+    rst['bytes_per_sec'] = rst.pop('ops_per_sec')
+    return rst
+
+
+def bench_interrupts(number, timeout=1.0):
+    '''Latency from a simulated edge to the callback in the dispatcher.'''
+    sim = SimulatedBackend()
+    fired = threading.Event()
+    stamps = []
+
+    def callback(pin):
+        stamps.append(time.perf_counter())
+        fired.set()
+
+    samples, lost = [], 0
+    with _Session(sim) as gpio:
+        gpio.setup(IRQ, GPIO.IN)
+        gpio.add_event_detect(IRQ, GPIO.RISING, func=callback)
+        gpio.enable_interrupts()
+        for _ in range(number):
+            sim.inject(IRQ, 0)
+            fired.clear()
+            t = time.perf_counter()
+            sim.inject(IRQ, 1)
+            if fired.wait(timeout):
+                samples.append(stamps[-1] - t)
+            else:
+                lost += 1
+    sim.close()
+    rst = _stats(samples)
+    rst['lost'] = lost
+    return rst
+
+
+class _Probe(object):
+    '''Stands in for a pin and records every level written to it.'''
+
+    def __init__(self):
+        self.edges = []
+
+    @property
+    def value(self):
+        return self.edges[-1][1] if self.edges else 0
+
+    @value.setter
+    def value(self, data):
+        self.edges.append((time.perf_counter(), int(data)))
+
+
+def bench_pwm(frequency, duty, duration):
+    '''Period and duty cycle jitter of software PWM.'''
+    probe = _Probe()
+    pwm = _PWM(probe, frequency)
+    pwm.start(duty)
+    time.sleep(duration)
+    pwm.clear()
+    rises = [t for t, v in probe.edges if v]
+    falls = [t for t, v in probe.edges if not v]
+    period = 1.0 / frequency
+    high = period * duty / 100.0
+    periods = [b - a for a, b in zip(rises, rises[1:])]
+    highs = [f - r for r, f in zip(rises, [f for f in falls if f > rises[0]])]
+    return {
+        'frequency': frequency, 'duty': duty, 'cycles': len(periods),
+        'period_error_us': _stats([p - period for p in periods]),
+        'high_error_us': _stats([h - high for h in highs]),
+        'lateness': pwm.stats.snapshot(),
+    }
+
+
+BENCHMARKS = ('sysfs', 'gpio', 'shiftout', 'interrupts', 'pwm')
+
+
+def run(root=None, number=10000, only=BENCHMARKS,
+        pwm_frequency=100, pwm_duty=50, pwm_duration=1.0):
+    '''Run selected benchmarks and return results as a dict.'''
+    tmp = None
+    if root is None:
+        root = tmp = make_fake_sysfs(tempfile.mkdtemp(prefix='gpio4-'))
+    results = {}
+    try:
+        for name in only:
+            if name == 'sysfs':
+                results[name] = bench_sysfs(root, number)
+            elif name == 'gpio':
+                results[name] = bench_gpio(root, number)
+            elif name == 'shiftout':
+                results[name] = bench_shiftout(root, number)
+            elif name == 'interrupts':
+                results[name] = bench_interrupts(max(1, number // 10))
+            elif name == 'pwm':
+                results[name] = bench_pwm(
+                    pwm_frequency, pwm_duty, pwm_duration)
+            else:
+                raise ValueError('Invalid benchmark: {}'.format(name))
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.time(),
+        'number': number,
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='gpio4-bench', description='Benchmark gpio4 hot paths.')
+    parser.add_argument('--root', help=('fake sysfs tree to run against, '
+                                        'a temporary one by default'))
+    parser.add_argument('-n', '--number', type=int, default=10000,
+                        help='iterations of each I/O benchmark')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS,
+                        default=list(BENCHMARKS))
+    parser.add_argument('--pwm-frequency', type=float, default=100)
+    parser.add_argument('--pwm-duty', type=float, default=50)
+    parser.add_argument('--pwm-duration', type=float, default=1.0)
+    parser.add_argument('-o', '--output', help='write JSON to this file')
+    args = parser.parse_args(argv)
+
+    if args.root is not None:
+        make_fake_sysfs(args.root)
+    rst = run(args.root, args.number, args.only,
+              args.pwm_frequency, args.pwm_duty, args.pwm_duration)
+    text = json.dumps(rst, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Logic analyzer: capture levels of a set of input pins.
+
+Two modes are supported:
+
+    - `Capture.sample(rate, ...)` reads all pins at a fixed rate
+
+    - `Capture.edges(duration, ...)` records edges delivered by GPIO's
+      epoll interrupts path, with their monotonic timestamps
+
+A capture is a stream of (monotonic_ns, mask) where bit i of mask is the
+level of pins[i]. It is either kept in a `CaptureBuffer` backed by arrays
+or streamed to a writer, so millions of samples never live in Python
+lists:
+
+    >>> cap = Capture(['PA6', 'PA7'])
+    >>> with open('dump.vcd', 'w') as f:
+    ...     cap.sample(100000, duration=2, sink=VCDWriter(f, cap.names))
+    >>> buf = cap.edges(duration=5)
+    >>> buf.save('dump.cap')  # raw binary, see read_raw()
+"""
+
+import time
+import array
+import struct
+
+from . import GPIO
+from .timing import Ticker, monotonic_ns, SPIN_NS
+
+RAW_MAGIC = b'GPIO4CAP'
+RAW_HEADER = struct.Struct('<8sII')  # magic, version, length of names
+RAW_RECORD = struct.Struct('<qQ')    # monotonic_ns, mask
+
+
+class CaptureBuffer(object):
+    '''Samples stored in two arrays: timestamps (ns) and masks.'''
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.timestamps = array.array('q')
+        self.masks = array.array('Q')
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __iter__(self):
+        return zip(self.timestamps, self.masks)
+
+    def __repr__(self):
+        return '<CaptureBuffer {} samples of {}>'.format(len(self), self.names)
+
+    def write(self, timestamp, mask):
+        self.timestamps.append(timestamp)
+        self.masks.append(mask)
+
+    def dump(self, writer):
+        for ts, mask in self:
+            writer.write(ts, mask)
+        writer.close()
+        return writer
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            self.dump(RawWriter(f, self.names))
+
+    def to_vcd(self, path, timescale='1ns'):
+        with open(path, 'w') as f:
+            self.dump(VCDWriter(f, self.names, timescale))
+
+
+class VCDWriter(object):
+    '''Stream samples as a Value Change Dump, only changes are written.'''
+
+    SCALES = {'1ns': 1, '1us': 1000, '1ms': 1000000}
+
+    def __init__(self, fileobj, names, timescale='1ns'):
+        if timescale not in self.SCALES:
+            raise ValueError('Invalid timescale: {}'.format(timescale))
+        if len(names) > 94:
+            raise ValueError('VCD writer supports at most 94 signals')
+        self.f = fileobj
+        self.names = list(names)
+        self._ids = [chr(33 + i) for i in range(len(self.names))]
+        self._scale = self.SCALES[timescale]
+        self._start = None
+        self._last = None
+        self.f.write('$date {} $end\n'.format(time.ctime()))
+        self.f.write('$version gpio4 $end\n')
+        self.f.write('$timescale {} $end\n'.format(timescale))
+        self.f.write('$scope module gpio4 $end\n')
+        for name, code in zip(self.names, self._ids):
+            self.f.write('$var wire 1 {} {} $end\n'.format(
+                code, str(name).replace(' ', '_')))
+        self.f.write('$upscope $end\n$enddefinitions $end\n')
+
+    def write(self, timestamp, mask):
+        if self._start is None:
+            self._start = timestamp
+            self.f.write('#0\n$dumpvars\n')
+            for i, code in enumerate(self._ids):
+                self.f.write('{}{}\n'.format((mask >> i) & 1, code))
+            self.f.write('$end\n')
+        elif mask != self._last:
+            diff = mask ^ self._last
+            self.f.write('#{}\n'.format(
+                (timestamp - self._start) // self._scale))
+            for i, code in enumerate(self._ids):
+                if (diff >> i) & 1:
+                    self.f.write('{}{}\n'.format((mask >> i) & 1, code))
+        self._last = mask
+
+    def close(self):
+        self.f.flush()
+
+
+class RawWriter(object):
+    '''
+    Stream samples as fixed size binary records: a header with pin names
+    followed by little endian (int64 monotonic_ns, uint64 mask) pairs.
+    '''
+
+    def __init__(self, fileobj, names):
+        self.f = fileobj
+        names = '\n'.join(str(n) for n in names).encode('utf-8')
+        self.f.write(RAW_HEADER.pack(RAW_MAGIC, 1, len(names)))
+        self.f.write(names)
+        self._pack = RAW_RECORD.pack
+
+    def write(self, timestamp, mask):
+        self.f.write(self._pack(timestamp, mask))
+
+    def close(self):
+        self.f.flush()
+
+
+def read_raw(path):
+    '''Load a capture saved by RawWriter into a CaptureBuffer.'''
+    with open(path, 'rb') as f:
+        magic, version, length = RAW_HEADER.unpack(
+            f.read(RAW_HEADER.size))
+        if magic != RAW_MAGIC:
+            raise ValueError('{} is not a gpio4 capture'.format(path))
+        names = f.read(length).decode('utf-8')
+        buf = CaptureBuffer(names.split('\n') if names else [])
+        data = f.read()
+    for ts, mask in RAW_RECORD.iter_unpack(
+            data[:len(data) - len(data) % RAW_RECORD.size]):
+        buf.write(ts, mask)
+    return buf
+
+
+class Capture(object):
+    def __init__(self, pins, gpio=None):
+        self.gpio = gpio or GPIO()
+        self.pins = self.gpio._listify(pins)
+        if len(self.pins) > 64:
+            raise ValueError('Capture supports at most 64 pins')
+        self.names = [str(p) for p in self.pins]
+        self._gpios = [
+            self.gpio._pin_dict[self.gpio._get_pin_num(p, must_in_dict=True)]
+            for p in self.pins]
+
+    def __repr__(self):
+        return '<Capture of {}>'.format(self.names)
+
+    def read(self):
+        '''Current levels of all pins as bitmask.'''
+        mask = 0
+        for i, g in enumerate(self._gpios):
+            mask |= g.value << i
+        return mask
+
+    def sample(self, rate, count=None, duration=None, sink=None,
+               spin=SPIN_NS):
+        '''
+        Read all pins `rate` times per second, `count` times or during
+        `duration` seconds. Samples go to `sink.write(ts, mask)` if given,
+        otherwise to a new CaptureBuffer which is returned.
+        '''
+        if count is None and duration is None:
+            raise ValueError('Provide count or duration')
+        if count is None:
+            count = int(rate * duration)
+        buf = sink if sink is not None else CaptureBuffer(self.names)
+        write, gpios = buf.write, list(enumerate(self._gpios))
+        ticker = Ticker(int(1e9 / rate), spin=spin)
+        for _ in range(count):
+            ticker.wait()
+            ts = monotonic_ns()
+            mask = 0
+            for i, g in gpios:
+                mask |= g.value << i
+            write(ts, mask)
+        self.stats = ticker.stats
+        return buf
+
+    def edges(self, duration, sink=None, interval=0.01, queue_size=65536):
+        '''
+        Record edges of all pins during `duration` seconds through GPIO's
+        interrupts path. Pins without event detect are watched on both
+        edges for the duration of the capture, others must be watched on
+        both edges already. The interrupts handler is started, or resumed
+        for the duration of the capture if it was paused by
+        `disable_interrupts()`.
+
+        Edges lost because an edge queue overflowed between two drains are
+        counted per pin in `overflows`, levels recorded after a loss may be
+        wrong until the next edge of that pin.
+        '''
+        gpio, added = self.gpio, []
+        irqs = []
+        try:
+            for pin in self.pins:
+                p = gpio._get_pin_num(pin, must_in_dict=True)
+                if p not in gpio._irq_dict:
+                    gpio.add_event_detect(pin, GPIO.BOTH,
+                                          queue_size=queue_size)
+                    added.append(pin)
+                irq = gpio._irq_dict[p]
+                if irq.edge != GPIO.BOTH:
+                    raise NameError((
+                        'Pin {} is already been attached to an interrupt on '
+                        '{} edge, capture needs both edges').format(
+                            pin, irq.edge))
+                if irq.events is None:
+                    raise NameError(('Pin {} has no event queue, add event '
+                                     'detect with queue_size > 0').format(pin))
+                irqs.append(irq)
+        except Exception:
+            for pin in added:
+                gpio.remove_event_detect(pin)
+            raise
+        for irq in irqs:
+            irq.events.clear()
+        lost = [irq.events.overflows for irq in irqs]
+        paused = gpio._thread_irq is not None and \
+            gpio._thread_irq.is_alive() and \
+            not gpio._flag_interrupts_enable.is_set()
+        gpio.enable_interrupts()
+        buf = sink if sink is not None else CaptureBuffer(self.names)
+        mask = self.read()
+        buf.write(monotonic_ns(), mask)
+        end = time.monotonic() + duration
+        try:
+            while True:
+                last = time.monotonic() >= end
+                if not last:
+                    time.sleep(interval)
+                # merge edges of all pins in time order
+                merged = []
+                for i, irq in enumerate(irqs):
+                    ts, vs = irq.events.drain()
+                    merged.extend(zip(ts, [i] * len(ts), vs))
+                merged.sort()
+                for ts, i, v in merged:
+                    mask = (mask | (1 << i)) if v else (mask & ~(1 << i))
+                    buf.write(ts, mask)
+                if last:
+                    break
+        finally:
+            self.overflows = {
+                name: irq.events.overflows - n
+                for name, irq, n in zip(self.names, irqs, lost)}
+            if paused:
+                gpio.disable_interrupts()
+            for pin in added:
+                gpio.remove_event_detect(pin)
+        return buf
+
+
+__all__ = ['Capture', 'CaptureBuffer', 'VCDWriter', 'RawWriter', 'read_raw']
@@ -8,13 +8,72 @@ Created on Wed May 16 18:14:02 2018
 """
 
 import re
+from types import MappingProxyType
+from collections.abc import Mapping
 
-class _sunxi():
-    def __getitem__(self, pin):
-        rst = re.findall(r"P([A-Z])(\d+)", str(pin))
+
+class _sunxi(dict):
+    '''
+    Resolve sunxi pin names like 'PA6' to 32 * bank + index. Every name is
+    parsed once, later lookups are plain dict hits.
+    '''
+    def __missing__(self, pin):
+        rst = re.search(r"P([A-Z])(\d+)", str(pin))
         if not rst:
             raise KeyError('pin name {} not supported!'.format(pin))
-        return 32*(ord(rst[0][0])-65) + int(rst[0][1])
+        self[pin] = num = 32*(ord(rst.group(1))-65) + int(rst.group(2))
+        return num
+
+    def name(self, num):
+        return 'P{}{}'.format(chr(65 + num // 32), num % 32)
+
+    @property
+    def table(self):
+        return self
+
+
+class _Board(Mapping):
+    '''
+    Immutable table of header pin -> gpio number, built on first use from
+    `load()`. `name(num)` gives the header pin of a gpio number.
+    '''
+    def __init__(self, load):
+        self._load = load
+        self._table = self._reverse = None
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = MappingProxyType(dict(self._load()))
+        return self._table
+
+    @property
+    def reverse(self):
+        if self._reverse is None:
+            self._reverse = MappingProxyType(
+                {v: k for k, v in self.table.items()})
+        return self._reverse
+
+    def name(self, num):
+        return self.reverse[num]
+
+    def __getitem__(self, pin):
+        return self.table[pin]
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def __len__(self):
+        return len(self.table)
+
+    def __repr__(self):
+        return '<Board {}>'.format(
+            'not loaded' if self._table is None else dict(self._table))
+
+
+def _by_name(header):
+    # header pin -> sunxi pin name, resolved when the table is loaded
+    return lambda: ((k, BOARD_SUNXI[v]) for k, v in header.items())
 
 
 RISING       = 'rising'
@@ -34,9 +93,25 @@ FOREVER      = 1e5
 FOREVER_ms   = 1e5 * 1000
 
 BOARD_SUNXI = _sunxi()
-BOARD_NANO_PI = {}
-BOARD_ORANGE_PI_PC = {}
-BCM = {}
+
+# NanoPi NEO 24 pin header
+BOARD_NANO_PI = _Board(_by_name({
+    3: 'PA12', 5: 'PA11', 7: 'PG11', 8: 'PG6', 10: 'PG7', 11: 'PA0',
+    12: 'PA6', 13: 'PA2', 15: 'PA3', 16: 'PG8', 18: 'PG9', 19: 'PC0',
+    21: 'PC1', 22: 'PA1', 23: 'PC2', 24: 'PC3',
+}))
+
+# OrangePi PC 40 pin header
+BOARD_ORANGE_PI_PC = _Board(_by_name({
+    3: 'PA12', 5: 'PA11', 7: 'PA6', 8: 'PA13', 10: 'PA14', 11: 'PA1',
+    12: 'PD14', 13: 'PA0', 15: 'PA3', 16: 'PC4', 18: 'PC7', 19: 'PC0',
+    21: 'PC1', 22: 'PA2', 23: 'PC2', 24: 'PC3', 26: 'PA21', 27: 'PA19',
+    28: 'PA18', 29: 'PA7', 31: 'PA8', 32: 'PG8', 33: 'PA9', 35: 'PA10',
+    36: 'PG9', 37: 'PA20', 38: 'PG6', 40: 'PG7',
+}))
+
+# Broadcom SoC channel numbers are gpio numbers
+BCM = _Board(lambda: ((n, n) for n in range(28)))
 
 __all__ = ['RISING', 'FALLING', 'CHANGE', 'HIGH', 'LOW',
            'OUTPUT', 'INPUT', 'INPUT_PULLUP', 'INPUT_PULLDN',
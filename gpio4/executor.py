@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Run interrupt callbacks on a pool of worker threads.
+
+By default callbacks registered with `GPIO.add_event_detect` run inline in
+the interrupts handler thread, so one slow callback delays every edge of
+every pin. With an executor the handler only queues them:
+
+    >>> from gpio4 import GPIO, CallbackExecutor
+    >>> GPIO().set_executor(CallbackExecutor(workers=4, maxsize=256))
+
+Edges of one pin always go to the same worker, so callbacks of a pin run
+in order. Each worker has a bounded queue, when it is full the edge is
+dropped (policy 'drop') or the handler waits for room (policy 'block').
+"""
+
+import sys
+import queue
+import threading
+import traceback
+
+
+class CallbackExecutor(object):
+    POLICIES = ('drop', 'block')
+
+    def __init__(self, workers=4, maxsize=1024, policy='drop'):
+        if workers < 1:
+            raise ValueError('Invalid workers: {}'.format(workers))
+        if policy not in self.POLICIES:
+            raise ValueError('Invalid policy: {}'.format(policy))
+        self.policy = policy
+        self.queued = 0    # edges handed to workers
+        self.dropped = 0   # edges dropped because queue was full
+        self.executed = 0  # callbacks that returned normally
+        self.failed = 0    # callbacks that raised
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._queues = [queue.Queue(maxsize) for _ in range(workers)]
+        self._threads = []
+        for q in self._queues:
+            t = threading.Thread(target=self._worker, args=(q,))
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def __repr__(self):
+        return '<CallbackExecutor workers:{} policy:{} {}>'.format(
+            len(self._threads), self.policy, self.stats())
+
+    def submit(self, key, callbacks, *args):
+        '''
+        Queue `callbacks` to be called with `args`. Tasks with the same
+        `key` (pin number) run in submission order. Return False if dropped.
+        '''
+        q = self._queues[hash(key) % len(self._queues)]
+        try:
+            q.put((callbacks, args), self.policy == 'block')
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.queued += 1
+        return True
+
+    def _worker(self, q):
+        while True:
+            task = q.get()
+            if task is None:
+                break
+            callbacks, args = task
+            for c in callbacks:
+                try:
+                    c(*args)
+                except Exception as e:
+                    with self._lock:
+                        self.failed += 1
+                        self.last_error = e
+                    traceback.print_exc(file=sys.stderr)
+                else:
+                    with self._lock:
+                        self.executed += 1
+
+    def pending(self):
+        return sum(q.qsize() for q in self._queues)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued': self.queued, 'dropped': self.dropped,
+                'executed': self.executed, 'failed': self.failed,
+                'pending': self.pending(),
+            }
+
+    def close(self, wait=True):
+        '''Stop workers after queued callbacks are done.'''
+        for q in self._queues:
+            q.put(None)
+        if wait:
+            for t in self._threads:
+                t.join()
+
+
+__all__ = ['CallbackExecutor']
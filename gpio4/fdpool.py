@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Process wide pool of sysfs attribute file descriptors.
+
+Value fds of interrupt pins, pin handles and hot pins (accessed `hot`
+times) are pinned: opened once and kept until every owner that pinned
+the path released it, so several pin objects of the same gpio can share
+a pinned fd without closing it under each other. At
+most half of the budget goes to hot pins, the rest stays for interrupts
+and the cache. Every other attribute (cold values, direction, edge,
+active_low) is cached in LRU order as long as the total number of open
+fds stays within `budget`, the least recently used one is closed to make
+room and reopened on demand.
+
+    >>> from gpio4.fdpool import pool
+    >>> pool.budget = 64
+    >>> pool.stats()
+    {'budget': 64, 'open': 12, 'pinned': 10, 'hits': 40, 'misses': 12, ...}
+"""
+
+import os
+import errno
+import threading
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:  # not on Linux
+    resource = None
+
+
+def _default_budget():
+    # leave most of the process limit to everything else
+    if resource is None:
+        return 256
+    soft = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+    if soft == resource.RLIM_INFINITY:
+        return 1024
+    return max(16, soft // 4)
+
+
+class FdPool(object):
+    hot = 16  # accesses before a value fd is pinned
+
+    def __init__(self, budget=None):
+        self.budget = _default_budget() if budget is None else budget
+        self._pinned = {}          # path -> fd, never evicted
+        self._owners = {}          # path -> set of owners of pinned fd
+        self._lru = OrderedDict()  # path -> fd, least recently used first
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __repr__(self):
+        return '<FdPool {}/{} fds>'.format(len(self), self.budget)
+
+    def __len__(self):
+        return len(self._pinned) + len(self._lru)
+
+    def pin(self, path, owner, required=True):
+        '''
+        Open `path` and keep the fd until all owners `release(path, owner)`
+        it. Pinned fds never exceed the budget: if there is no room, raise
+        OSError (EMFILE) or return None when the pin is not `required` (hot
+        pins, which are limited to half of the budget).
+        '''
+        with self._lock:
+            fd = self._pinned.get(path)
+            if fd is not None:
+                self.hits += 1
+                self._owners[path].add(owner)
+                return fd
+            limit = self.budget if required else self.budget // 2
+            if len(self._pinned) >= limit:
+                if not required:
+                    return None
+                raise OSError(errno.EMFILE, ('All {} fds of the pool are '
+                                             'pinned').format(self.budget),
+                              path)
+            fd = self._lru.pop(path, None)  # promote a cached one
+            if fd is None:
+                self.misses += 1
+                self._evict(1)
+                fd = os.open(path, os.O_RDWR)
+            else:
+                self.hits += 1
+            self._pinned[path] = fd
+            self._owners[path] = {owner}
+            return fd
+
+    def release(self, path, owner):
+        '''Drop reference of `owner` to pinned `path`, close it if last.'''
+        with self._lock:
+            owners = self._owners.get(path)
+            if owners is None:
+                return
+            owners.discard(owner)
+            if not owners:
+                del self._owners[path]
+                os.close(self._pinned.pop(path))
+
+    def close(self, path):
+        '''Close cached fd of `path` if any, pinned ones are released.'''
+        with self._lock:
+            fd = self._lru.pop(path, None)
+            if fd is not None:
+                os.close(fd)
+
+    def close_all(self, paths):
+        for path in paths:
+            self.close(path)
+
+    def pread(self, path, size=64):
+        with self._lock:
+            try:
+                return os.pread(self._get(path), size, 0)
+            finally:
+                self._evict(0)  # pinned fds may leave no room to cache
+
+    def pwrite(self, path, data, truncate=False):
+        with self._lock:
+            try:
+                fd = self._get(path)
+                os.pwrite(fd, data, 0)
+                if truncate:
+                    os.ftruncate(fd, len(data))
+            finally:
+                self._evict(0)
+
+    def _get(self, path):
+        # called with lock held, fd is valid until the lock is released
+        fd = self._pinned.get(path)
+        if fd is not None:
+            self.hits += 1
+            return fd
+        fd = self._lru.get(path)
+        if fd is not None:
+            self.hits += 1
+            self._lru.move_to_end(path)
+            return fd
+        self.misses += 1
+        self._evict(1)
+        fd = self._lru[path] = os.open(path, os.O_RDWR)
+        return fd
+
+    def _evict(self, room):
+        while self._lru and len(self) + room > self.budget:
+            _, fd = self._lru.popitem(last=False)
+            os.close(fd)
+            self.evictions += 1
+
+    def trim(self):
+        '''Close cached fds until the pool fits in its budget.'''
+        with self._lock:
+            self._evict(0)
+
+    def stats(self):
+        return {
+            'budget': self.budget, 'open': len(self),
+            'pinned': len(self._pinned), 'cached': len(self._lru),
+            'hits': self.hits, 'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+pool = FdPool()
+
+
+__all__ = ['FdPool', 'pool']
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Drive a set of pins as one port, e.g. the data bus of a parallel LCD.
+
+A PinGroup reads and writes integer words whose bit i is the level of
+pins[i]. Writes only touch pins whose bit changed since the last write,
+so a 16 bits bus costs as many syscalls as changed bits:
+
+    >>> from gpio4.group import PinGroup
+    >>> gpio.setup(bus_pins, GPIO.OUT)
+    >>> bus = PinGroup(bus_pins)
+    >>> bus.write(0x5A)
+    >>> bus.write(0x5B)  # one pin written
+    >>> bus.read()
+    91
+
+The last written word is cached, call `refresh()` if pins of the group
+are also written by other means. Pins all in the same bank of a
+SunxiBackend are written with one register access.
+"""
+
+from . import GPIO
+from .backends import SunxiGPIO
+
+
+class PinGroup(object):
+    def __init__(self, pins, gpio=None):
+        self.gpio = gpio or GPIO()
+        self.pins = self.gpio._listify(pins)
+        self._gpios = [
+            self.gpio._pin_dict[self.gpio._get_pin_num(p, must_in_dict=True)]
+            for p in self.pins]
+        self.mask = (1 << len(self._gpios)) - 1
+        self.writes = 0  # pin writes actually issued
+        self.refresh()
+
+    def __repr__(self):
+        return '<PinGroup of {}>'.format(self.pins)
+
+    def __len__(self):
+        return len(self._gpios)
+
+    def refresh(self):
+        '''Forget the cached word, e.g. after pins are written elsewhere.'''
+        self._state = None
+        self._port = None
+        gpios = self._gpios
+        if gpios and all(isinstance(g, SunxiGPIO) for g in gpios) and \
+                len(set((id(g.backend), g.bank) for g in gpios)) == 1:
+            # (backend, bank, bank bit of each group bit, active low bits)
+            self._port = (gpios[0].backend, gpios[0].bank,
+                          [g.mask for g in gpios],
+                          sum(g.mask for g in gpios if int(g.active_low)))
+
+    def read(self):
+        '''Levels of all pins as a word.'''
+        if self._port is not None:
+            backend, bank, masks, invert = self._port
+            levels = backend.read_port(bank) ^ invert
+            return sum(1 << i for i, m in enumerate(masks) if levels & m)
+        word = 0
+        for i, g in enumerate(self._gpios):
+            word |= g.value << i
+        return word
+
+    def write(self, word):
+        '''Set all pins to bits of `word`, only changed pins are written.'''
+        word &= self.mask
+        diff = self.mask if self._state is None else word ^ self._state
+        if not diff:
+            return
+        if self._port is not None:
+            backend, bank, masks, invert = self._port
+            value = select = 0
+            for i, m in enumerate(masks):
+                if (diff >> i) & 1:
+                    select |= m
+                    if (word >> i) & 1:
+                        value |= m
+            backend.write_port(bank, value ^ invert, select)
+            self.writes += 1
+        else:
+            gpios, i = self._gpios, 0
+            while diff:
+                if diff & 1:
+                    gpios[i].value = (word >> i) & 1
+                    self.writes += 1
+                diff >>= 1
+                i += 1
+        self._state = word
+
+    def set(self, bits):
+        '''Drive pins selected by `bits` high, keep the others.'''
+        self.write((self.read() if self._state is None else self._state)
+                   | bits)
+
+    def clear(self, bits):
+        '''Drive pins selected by `bits` low, keep the others.'''
+        self.write((self.read() if self._state is None else self._state)
+                   & ~bits)
+
+
+__all__ = ['PinGroup']
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Opt-in latency histograms of gpio4 hot paths and a Prometheus exporter.
+
+    >>> from gpio4 import GPIO, metrics
+    >>> metrics.enable()
+    >>> ...
+    >>> GPIO().stats()['histograms']['sysfs_write']['6']
+    {'count': 1000, 'sum_ns': 812345, 'mean_ns': 812.3, 'p50_ns': 1023, ...}
+    >>> print(metrics.prometheus())
+
+Enabling installs timed wrappers around these methods, disabling puts
+the originals back, so there is no cost at all while disabled:
+
+    - sysfs_read / sysfs_write: syscalls of SysfsGPIO, per gpio number
+    - input / output: GPIO.input / GPIO.output dispatch, per pin
+    - callback_latency: edge timestamp to start of callback, per pin
+    - callback_duration: time spent in callbacks, per pin
+
+Pin handles of `GPIO.pin()` skip dispatch and are not timed. Counters that
+are always kept (debounce rejections, edge queue overflows, PWM overruns,
+executor and fd pool) are collected by `GPIO.stats()` either way.
+
+Histograms have 64 fixed log2 buckets in an array: bucket i counts
+durations of i bits, i.e. in [2 ** (i - 1), 2 ** i) ns.
+"""
+
+import sys
+import array
+import functools
+import traceback
+
+from . import GPIO
+from .timing import monotonic_ns
+from .fdpool import pool
+from .backends import SysfsGPIO
+
+
+class Histogram(object):
+    __slots__ = ('counts', 'count', 'total')
+    BUCKETS = 64
+
+    def __init__(self):
+        self.counts = array.array('Q', [0]) * self.BUCKETS
+        self.count = self.total = 0
+
+    def __repr__(self):
+        return '<Histogram {}>'.format(self.snapshot())
+
+    def record(self, ns):
+        self.counts[min(ns.bit_length(), 63)] += 1
+        self.count += 1
+        self.total += ns
+
+    def quantile(self, q):
+        '''Upper bound in ns of the bucket holding quantile `q`.'''
+        rank, seen = q * self.count, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return 1 << i
+        return 0
+
+    def snapshot(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count, 'sum_ns': self.total,
+            'mean_ns': self.total / self.count,
+            'p50_ns': self.quantile(0.5), 'p99_ns': self.quantile(0.99),
+            'buckets': self.counts.tolist(),
+        }
+
+
+class Metrics(object):
+    def __init__(self):
+        self.histograms = {}  # name -> {pin: Histogram}
+        self._originals = {}  # (class, attribute) -> original
+
+    @property
+    def enabled(self):
+        return bool(self._originals)
+
+    def histogram(self, name, pin):
+        try:
+            return self.histograms[name][pin]
+        except KeyError:
+            h = self.histograms.setdefault(name, {})[pin] = Histogram()
+            return h
+
+    def record(self, name, pin, ns):
+        try:
+            h = self.histograms[name][pin]
+        except (KeyError, TypeError):
+            h = self.histogram(name, _key(pin))
+        h.record(ns)
+
+    def reset(self):
+        self.histograms.clear()
+
+    def _patch(self, cls, attr, value):
+        self._originals.setdefault((cls, attr), cls.__dict__[attr])
+        setattr(cls, attr, value)
+
+    def enable(self):
+        if self.enabled:
+            return
+        record = self.record
+
+        def timed(name, func, key):
+            @functools.wraps(func)
+            def wrapper(self, *a, **kw):
+                t = monotonic_ns()
+                try:
+                    return func(self, *a, **kw)
+                finally:
+                    record(name, key(self, a, kw), monotonic_ns() - t)
+            return wrapper
+
+        sysfs_pin = lambda self, a, kw: self.pin                    # noqa
+        gpio_pin = lambda self, a, kw: a[0] if a else kw.get('pin')  # noqa
+        self._patch(SysfsGPIO, '_read',
+                    timed('sysfs_read', SysfsGPIO._read, sysfs_pin))
+        self._patch(SysfsGPIO, '_read_value',
+                    timed('sysfs_read', SysfsGPIO._read_value, sysfs_pin))
+        self._patch(SysfsGPIO, '_write',
+                    timed('sysfs_write', SysfsGPIO._write, sysfs_pin))
+        value = SysfsGPIO.value
+        self._patch(SysfsGPIO, 'value', property(value.fget, timed(
+            'sysfs_write', value.fset, sysfs_pin)))
+        self._patch(GPIO, 'input', timed('input', GPIO.input, gpio_pin))
+        self._patch(GPIO, 'output', timed('output', GPIO.output, gpio_pin))
+        self._patch(GPIO, '_invoke',
+                    lambda gpio, irq, ts: self._invoke(gpio, irq, ts))
+
+    def disable(self):
+        for (cls, attr), original in self._originals.items():
+            setattr(cls, attr, original)
+        self._originals.clear()
+
+    def _invoke(self, gpio, irq, ts):
+        # GPIO._invoke with latency and duration of every callback
+        record, key = self.record, irq.pin_name
+
+        def timed(c):
+            def wrapper(*a):
+                start = monotonic_ns()
+                record('callback_latency', key, start - ts)
+                try:
+                    return c(*a)
+                finally:
+                    record('callback_duration', key, monotonic_ns() - start)
+            return wrapper
+
+        if gpio._executor is not None:
+            gpio._executor.submit(irq.pin, [timed(c) for c in irq.callbacks],
+                                  irq.pin_name)
+            return
+        for c in irq.callbacks:
+            try:
+                timed(c)(irq.pin_name)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    def snapshot(self, gpio=None):
+        '''All counters and histograms as a dict, see `GPIO.stats()`.'''
+        rst = {
+            'enabled': self.enabled,
+            'histograms': {
+                name: {str(pin): h.snapshot() for pin, h in pins.items()}
+                for name, pins in self.histograms.items()},
+            'fds': pool.stats(),
+        }
+        if gpio is None:
+            return rst
+        pins = rst['pins'] = {}
+        for irq in list(gpio._irq_dict.values()):
+            pins[str(irq.pin_name)] = {
+                'debounce_rejected': irq.rejected,
+                'edges': None if irq.events is None else irq.events.total,
+                'edge_overflows': 0 if irq.events is None
+                else irq.events.overflows,
+            }
+        rst['pwm'] = {
+            str(p): pwm.stats.snapshot()
+            for p, pwm in list(gpio._pwm_dict.items())
+            if hasattr(pwm, 'stats')}
+        if gpio._executor is not None:
+            rst['executor'] = gpio._executor.stats()
+        return rst
+
+
+def _key(pin):
+    # lists of pins given to GPIO.input/output
+    return tuple(pin) if isinstance(pin, list) else pin
+
+
+def _labels(**kw):
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('"', '\\"'))
+                          for k, v in kw.items()) + '}'
+
+
+def prometheus(stats=None, prefix='gpio4'):
+    '''Render `GPIO.stats()` (default: a fresh one) as Prometheus text.'''
+    if stats is None:
+        stats = GPIO().stats()
+    lines = []
+
+    def metric(name, kind, samples):
+        if not samples:
+            return
+        lines.append('# TYPE {}_{} {}'.format(prefix, name, kind))
+        for suffix, labels, value in samples:
+            lines.append('{}_{}{}{} {}'.format(
+                prefix, name, suffix, labels, value))
+
+    for name, pins in sorted(stats.get('histograms', {}).items()):
+        samples = []
+        for pin, h in sorted(pins.items()):
+            if not h['count']:
+                continue
+            used = [i for i, n in enumerate(h['buckets']) if n]
+            seen = 0
+            for i in range(used[0], used[-1] + 1):
+                seen += h['buckets'][i]
+                samples.append(('_bucket', _labels(pin=pin, le=repr(
+                    (1 << i) / 1e9)), seen))
+            samples.append(('_bucket', _labels(pin=pin, le='+Inf'),
+                            h['count']))
+            samples.append(('_sum', _labels(pin=pin), h['sum_ns'] / 1e9))
+            samples.append(('_count', _labels(pin=pin), h['count']))
+        metric(name + '_seconds', 'histogram', samples)
+
+    pins = stats.get('pins', {})
+    for field in ('debounce_rejected', 'edge_overflows', 'edges'):
+        metric(field + '_total', 'counter', [
+            ('', _labels(pin=pin), c[field]) for pin, c in sorted(
+                pins.items()) if c[field] is not None])
+    pwm = stats.get('pwm', {})
+    metric('pwm_overruns_total', 'counter', [
+        ('', _labels(pin=pin), s['overruns'])
+        for pin, s in sorted(pwm.items())])
+    for field in ('queued', 'dropped', 'executed', 'failed'):
+        if 'executor' in stats:
+            metric('callbacks_{}_total'.format(field), 'counter',
+                   [('', '', stats['executor'][field])])
+    fds = stats.get('fds', {})
+    for field in ('open', 'pinned', 'cached', 'budget'):
+        if field in fds:
+            metric('fds_' + field, 'gauge', [('', '', fds[field])])
+    for field in ('hits', 'misses', 'evictions'):
+        if field in fds:
+            metric('fd_pool_{}_total'.format(field), 'counter',
+                   [('', '', fds[field])])
+    return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+enable = metrics.enable
+disable = metrics.disable
+reset = metrics.reset
+snapshot = metrics.snapshot
+
+
+__all__ = ['Histogram', 'Metrics', 'metrics', 'enable', 'disable', 'reset',
+           'snapshot', 'prometheus']
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Software PWM driven by one scheduler thread.
+
+All running channels share a heap of absolute edge deadlines. The
+scheduler sleeps until the earliest one and services every edge due
+within `_PWMScheduler.window` in the same wake-up, so jitter does not grow
+with the number of channels and no thread is spawned per channel.
+
+Duty cycle and frequency changes are applied at the next period boundary,
+a period is never cut short. 0% and 100% duty cycle are static levels
+without any toggling.
+
+Every channel keeps JitterStats of its edges: lateness against the ideal
+deadline and overruns, i.e. edges serviced after the next one was due.
+
+Pins routed to a hardware PWM channel (see `SysfsBackend(pwm_map=...)`)
+use `_HardwarePWM` instead, which programs /sys/class/pwm/pwmchipN/pwmM
+and costs no CPU at all.
+"""
+
+import os
+import errno
+import heapq
+import itertools
+import threading
+
+from .timing import SPIN_NS, monotonic_ns, JitterStats
+from .backends import _is_scratch, _wait_access
+
+
+class _PWMScheduler(object):
+    window = 50000  # ns, edges due this close to each other share a wake-up
+    spin = SPIN_NS  # ns, busy-wait tail before a deadline
+
+    def __init__(self):
+        self._heap = []  # (deadline_ns, seq, generation, channel)
+        self._seq = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+        self._thread = None
+
+    def schedule(self, channel, deadline):
+        # called with self._cond held
+        heapq.heappush(self._heap, (deadline, next(self._seq),
+                                    channel._generation, channel))
+        if self._heap[0][3] is channel:
+            self._cond.notify()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        heap = self._heap
+        with self._cond:
+            while True:
+                if not heap:
+                    self._cond.wait()
+                    continue
+                now = monotonic_ns()
+                remain = heap[0][0] - now
+                if remain > self.spin:
+                    self._cond.wait((remain - self.spin) / 1e9)
+                    continue
+                while monotonic_ns() < heap[0][0]:
+                    pass  # spin, keeps the lock for at most self.spin ns
+                limit = monotonic_ns() + self.window
+                while heap and heap[0][0] <= limit:
+                    deadline, _, gen, channel = heapq.heappop(heap)
+                    if gen != channel._generation:  # stopped or changed
+                        continue
+                    nxt = channel._edge(deadline)
+                    now = monotonic_ns()
+                    channel.stats.record(
+                        now - deadline, nxt is not None and now >= nxt)
+                    if nxt is not None:
+                        heapq.heappush(heap, (nxt, next(self._seq),
+                                              gen, channel))
+
+
+_scheduler = _PWMScheduler()
+
+
+class _PWM(object):
+    def __init__(self, sysfsgpio, frequency, scheduler=None):
+        self._sysfsgpio = sysfsgpio
+        self._scheduler = scheduler or _scheduler
+        self._lock = self._scheduler._cond
+        self._generation = 0
+        self._running = False
+        self._dc = 0.0
+        self._high = False    # in high phase, next edge is falling
+        self._static = False  # 0% or 100%, not scheduled
+        self._rise = 0        # deadline of the current period
+        self.stats = JitterStats()
+        self.ChangeFrequency(frequency)
+
+    def __repr__(self):
+        return '<PWM of {} {}Hz {}% {}>'.format(
+            self._sysfsgpio, self._frequency, self._dc * 100,
+            'running' if self._running else 'stopped')
+
+    def _edge(self, deadline):
+        # called by scheduler with lock held, return next deadline or None
+        if self._high:
+            self._sysfsgpio.value = 0
+            self._high = False
+            return self._rise + self._period_ns
+        # period boundary: new duty cycle and frequency take effect here
+        self._period_ns, self._high_ns = self._next
+        self._rise = deadline
+        if self._high_ns <= 0 or self._high_ns >= self._period_ns:
+            # static level, no toggling until duty cycle changes
+            self._sysfsgpio.value = int(self._high_ns > 0)
+            self._static = True
+            return None
+        self._sysfsgpio.value = 1
+        self._high = True
+        return deadline + self._high_ns
+
+    def _update(self, frequency, dc):
+        period = int(1e9 / frequency)
+        self._next = (period, int(round(period * dc)))
+        if self._running and self._static:
+            self._static = False
+            self._generation += 1
+            self._scheduler.schedule(self, monotonic_ns())
+
+    def start(self, dc):
+        self.ChangeDutyCycle(dc)
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+            self._generation += 1
+            self._high = self._static = False
+            self._scheduler.schedule(self, monotonic_ns())
+
+    def stop(self):
+        with self._lock:
+            if self._running:
+                self._sysfsgpio.value = 0
+            self._running = self._high = self._static = False
+            self._generation += 1  # drop pending edges
+
+    def ChangeFrequency(self, frequency):
+        if frequency <= 0:
+            raise ValueError('Invalid frequency: {}'.format(frequency))
+        with self._lock:
+            self._frequency = frequency
+            self._update(frequency, self._dc)
+
+    def ChangeDutyCycle(self, dc):
+        if dc > 100 or dc < 0:
+            raise ValueError('Invalid duty cycle: {}'.format(dc))
+        with self._lock:
+            self._dc = float(dc) / 100
+            self._update(self._frequency, self._dc)
+
+    def clear(self):
+        self.stop()
+
+
+class _HardwarePWM(object):
+    '''Same interface as _PWM on top of the sysfs pwm interface.'''
+
+    def __init__(self, chip, channel, frequency, root='/sys/class/pwm'):
+        self.chip = int(chip)
+        self.channel = int(channel)
+        self.root = os.path.join(root, 'pwmchip{:d}'.format(self.chip))
+        self.path = os.path.join(self.root, 'pwm{:d}'.format(self.channel))
+        self._truncate = _is_scratch(root)
+        self._fd = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._dc = 0.0
+        self._period_ns = self._duty_ns = 0
+        if not os.path.exists(self.path):
+            with open(os.path.join(self.root, 'export'), 'w') as f:
+                f.write(str(self.channel))
+        paths = [os.path.join(self.path, attr)
+                 for attr in ('period', 'duty_cycle', 'enable')]
+        if not _wait_access(paths):
+            raise OSError(errno.EACCES, '{} not accessible after export'
+                          .format(self.path), self.path)
+        for path in paths:
+            self._fd[os.path.basename(path)] = os.open(path, os.O_RDWR)
+        self.ChangeFrequency(frequency)
+
+    def __repr__(self):
+        return '<HardwarePWM {} {}Hz {}% {}>'.format(
+            self.path, self._frequency, self._dc * 100,
+            'running' if self._running else 'stopped')
+
+    def _write(self, attr, data):
+        data = str(data).encode('utf-8')
+        os.pwrite(self._fd[attr], data, 0)
+        if self._truncate:
+            os.ftruncate(self._fd[attr], len(data))
+
+    def _update(self, period, dc):
+        duty = int(round(period * dc))
+        # kernel rejects duty_cycle > period at any moment
+        if period >= self._period_ns:
+            if period != self._period_ns:
+                self._write('period', period)
+            if duty != self._duty_ns:
+                self._write('duty_cycle', duty)
+        else:
+            if duty != self._duty_ns:
+                self._write('duty_cycle', duty)
+            self._write('period', period)
+        self._period_ns, self._duty_ns = period, duty
+
+    def start(self, dc):
+        self.ChangeDutyCycle(dc)
+        with self._lock:
+            if not self._running:
+                self._write('enable', 1)
+                self._running = True
+
+    def stop(self):
+        with self._lock:
+            if self._running:
+                self._write('enable', 0)
+                self._running = False
+
+    def ChangeFrequency(self, frequency):
+        if frequency <= 0:
+            raise ValueError('Invalid frequency: {}'.format(frequency))
+        with self._lock:
+            self._frequency = frequency
+            self._update(int(round(1e9 / frequency)), self._dc)
+
+    def ChangeDutyCycle(self, dc):
+        if dc > 100 or dc < 0:
+            raise ValueError('Invalid duty cycle: {}'.format(dc))
+        with self._lock:
+            self._dc = float(dc) / 100
+            self._update(self._period_ns, self._dc)
+
+    def clear(self):
+        self.stop()
+        for fd in self._fd.values():
+            os.close(fd)
+        self._fd.clear()
+        if os.path.exists(self.path):
+            with open(os.path.join(self.root, 'unexport'), 'w') as f:
+                f.write(str(self.channel))
+
+
+__all__ = []
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Record interrupt traffic to a binary log and replay it.
+
+    >>> from gpio4.record import Recorder, EventLog, replay
+    >>> with Recorder('field.log'):  # every pin with event detect
+    ...     time.sleep(60)
+    >>> log = EventLog('field.log')
+    >>> len(log), log[0]
+    (18342, (6, 'rising', 1, 5362103321457))
+    >>> replay(log, speed=10)  # same pins watched, 10 times faster
+    {'events': 18342, 'skipped': 0, 'seconds': 6.01, ...}
+
+The log is a 32 bytes header followed by 16 bytes records of
+(uint32 gpio number, uint8 edge, uint8 value, int64 monotonic_ns), all
+little endian, so it can be mmap'ed and indexed directly, e.g. with
+`numpy.memmap(path, RECORD_DTYPE, offset=HEADER.size)`.
+
+Edges are recorded after debouncing, as seen by callbacks. Replay feeds
+them to `GPIO._fire`, i.e. the same listeners, edge queues, callbacks
+and executor as real interrupts, on pins that have event detect set up.
+"""
+
+import os
+import mmap
+import struct
+import threading
+
+from . import GPIO
+from .timing import monotonic_ns, sleep_until, JitterStats
+
+MAGIC = b'GPIO4REC'
+HEADER = struct.Struct('<8sIIq8x')  # magic, version, record size, start ns
+RECORD = struct.Struct('<IBBxxq')   # gpio number, edge, value, ns
+RECORD_DTYPE = [('pin', '<u4'), ('edge', 'u1'), ('value', 'u1'),
+                ('pad', 'V2'), ('ts', '<i8')]
+EDGES = {GPIO.RISING: 1, GPIO.FALLING: 2, GPIO.BOTH: 3}
+EDGE_NAMES = {v: k for k, v in EDGES.items()}
+
+
+class Recorder(object):
+    def __init__(self, path, pins=None, gpio=None):
+        '''
+        Record edges of `pins` (default: all pins with event detect at
+        `start()`) to file `path`.
+        '''
+        self.path = path
+        self.gpio = gpio or GPIO()
+        self.pins = pins
+        self.count = 0
+        self._file = None
+        self._hooks = []  # (irq, listener)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<Recorder {} {} events>'.format(self.path, self.count)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *a):
+        self.stop()
+
+    def start(self):
+        if self._file is not None:
+            return self
+        gpio = self.gpio
+        if self.pins is None:
+            irqs = list(gpio._irq_dict.values())
+        else:
+            irqs = [gpio._get_irq(p) for p in gpio._listify(self.pins)]
+        self._file = open(self.path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, 1, RECORD.size, monotonic_ns()))
+        for irq in irqs:
+            listener = self._listener(irq.pin)
+            irq.listeners.append(listener)
+            self._hooks.append((irq, listener))
+        return self
+
+    def _listener(self, pin):
+        pack, lock = RECORD.pack, self._lock
+        # direction of the edge follows from the level it left behind
+        rising, falling = EDGES[GPIO.RISING], EDGES[GPIO.FALLING]
+
+        def listener(pin_name, value, ts):
+            edge = rising if value else falling
+            with lock:
+                if self._file is not None:
+                    self._file.write(pack(pin, edge, value, ts))
+                    self.count += 1
+        return listener
+
+    def stop(self):
+        for irq, listener in self._hooks:
+            try:
+                irq.listeners.remove(listener)
+            except ValueError:
+                pass
+        self._hooks = []
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class EventLog(object):
+    '''Read only view of a recorded log, mmap'ed.'''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < HEADER.size:
+                raise ValueError('{} is not a gpio4 event log'.format(path))
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size, self.start = \
+            HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or record_size != RECORD.size:
+            self.close()
+            raise ValueError('{} is not a gpio4 event log'.format(path))
+        # a partially written last record is ignored
+        self._len = (size - HEADER.size) // RECORD.size
+
+    def __repr__(self):
+        return '<EventLog {} {} events>'.format(self.path, len(self))
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('event index out of range')
+        pin, edge, value, ts = RECORD.unpack_from(
+            self._mmap, HEADER.size + i * RECORD.size)
+        return pin, EDGE_NAMES.get(edge, edge), value, ts
+
+    def __iter__(self):
+        end = HEADER.size + self._len * RECORD.size
+        for pin, edge, value, ts in RECORD.iter_unpack(
+                memoryview(self._mmap)[HEADER.size:end]):
+            yield pin, EDGE_NAMES.get(edge, edge), value, ts
+
+    def close(self):
+        self._mmap.close()
+
+
+def replay(log, speed=1.0, gpio=None):
+    '''
+    Fire recorded edges again with their original spacing divided by
+    `speed`, or back to back if speed is None. Edges of pins without
+    event detect are skipped. Return statistics.
+    '''
+    if not isinstance(log, EventLog):
+        log = EventLog(log)
+    if speed is not None and speed <= 0:
+        raise ValueError('Invalid speed: {}'.format(speed))
+    gpio = gpio or GPIO()
+    irqs = gpio._irq_dict
+    lateness = JitterStats()
+    events = skipped = 0
+    first = start = None
+    begin = monotonic_ns()
+    for pin, edge, value, ts in log:
+        irq = irqs.get(pin)
+        if irq is None:
+            skipped += 1
+            continue
+        if speed is None:
+            now = monotonic_ns()
+        else:
+            if first is None:
+                first, start = ts, monotonic_ns()
+            now = start + int((ts - first) / speed)
+            lateness.record(sleep_until(now))
+        gpio._fire(irq, now, value)
+        events += 1
+    seconds = (monotonic_ns() - begin) / 1e9
+    return {
+        'events': events, 'skipped': skipped, 'seconds': seconds,
+        'rate': events / seconds if seconds else None,
+        'lateness': lateness.snapshot(),
+    }
+
+
+__all__ = ['Recorder', 'EventLog', 'replay', 'RECORD', 'HEADER',
+           'RECORD_DTYPE']
@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Bit-banged serial transfers: shift registers and SPI.
+
+Pins are resolved once when a Shifter is created, every bit then costs
+only the pin writes/reads themselves. Data pin is written only when the
+bit changes. Buffers can be bytes, bytearray or memoryview of any length:
+
+    >>> from gpio4.shift import Shifter
+    >>> gpio.setup(['PA6', 'PA7', 'PA8'], GPIO.OUT)
+    >>> chain = Shifter(clock='PA7', mosi='PA6')  # 74HC595 x 4
+    >>> chain.write(b'\\x01\\x02\\x04\\x08')
+    >>> gpio.output('PA8', 1)  # latch
+    >>> spi = Shifter('PA7', mosi='PA6', miso='PA9', mode=3)
+    >>> spi.transfer(b'\\x9f\\x00\\x00\\x00')  # JEDEC ID of a SPI flash
+    bytearray(b'\\xff\\xef\\x40\\x18')
+
+`mode` is the usual SPI mode: bit 1 is CPOL (idle level of clock), bit 0
+is CPHA (data sampled on the trailing instead of the leading edge).
+Mode 0 is also what Arduino shiftIn/shiftOut do.
+"""
+
+from . import GPIO
+from .constants import MSBFIRST, LSBFIRST
+from .timing import sleep_ns
+
+# levels of each bit of every byte value, in transmission order
+_BITS = {
+    MSBFIRST: [tuple((b >> (7 - i)) & 1 for i in range(8))
+               for b in range(256)],
+    LSBFIRST: [tuple((b >> i) & 1 for i in range(8)) for b in range(256)],
+}
+_SHIFTS = {MSBFIRST: tuple(range(7, -1, -1)), LSBFIRST: tuple(range(8))}
+
+
+class Shifter(object):
+    def __init__(self, clock, mosi=None, miso=None, mode=0,
+                 bit_order=MSBFIRST, delay=0, gpio=None):
+        '''
+        Shift bits out on `mosi` and/or in from `miso`, clocked by `clock`.
+        `delay` is the half period of clock in ns, 0 for as fast as
+        possible. Pins must be setup already.
+        '''
+        if mode not in (0, 1, 2, 3):
+            raise ValueError('Invalid SPI mode: {}'.format(mode))
+        if bit_order not in _BITS:
+            raise ValueError('Invalid bitOrder: {}'.format(bit_order))
+        self.gpio = gpio or GPIO()
+        self.mode = mode
+        self.bit_order = bit_order
+        self.delay = delay
+        self._clock = self._resolve(clock)
+        self._mosi = self._resolve(mosi)
+        self._miso = self._resolve(miso)
+        self._idle = (mode >> 1) & 1
+        self._clock.value = self._idle
+
+    def __repr__(self):
+        return '<Shifter mode {} {}>'.format(
+            self.mode, 'MSBFIRST' if self.bit_order == MSBFIRST
+            else 'LSBFIRST')
+
+    def _resolve(self, pin):
+        if pin is None:
+            return None
+        p = self.gpio._get_pin_num(pin, must_in_dict=True)
+        return self.gpio._pin_dict[p]
+
+    def transfer(self, data, bit_order=None):
+        '''
+        Shift out every byte of `data` while shifting in the same number of
+        bytes, which are returned as bytearray (zeros without miso).
+        '''
+        order = bit_order or self.bit_order
+        bits, shifts = _BITS[order], _SHIFTS[order]
+        if isinstance(data, memoryview):
+            data = data.cast('B')
+        clock, mosi, miso = self._clock, self._mosi, self._miso
+        idle, active = self._idle, self._idle ^ 1
+        cpha, delay = self.mode & 1, self.delay
+        # mosi may have been driven elsewhere since the last transfer, so
+        # its level is only trusted within this one
+        last = None
+        rx = bytearray(len(data))
+        for n, byte in enumerate(data):
+            value = 0
+            for k, bit in zip(shifts, bits[byte]):
+                if cpha:
+                    clock.value = active
+                if mosi is not None and bit != last:
+                    mosi.value = last = bit
+                if delay:
+                    sleep_ns(delay)
+                if cpha:
+                    clock.value = idle
+                else:
+                    clock.value = active
+                if miso is not None:
+                    value |= miso.value << k
+                if delay:
+                    sleep_ns(delay)
+                if not cpha:
+                    clock.value = idle
+            rx[n] = value
+        return rx
+
+    def write(self, data, bit_order=None):
+        '''Shift out bytes of `data`.'''
+        if self._mosi is None:
+            raise NameError('Shifter has no mosi pin to write to')
+        self.transfer(data, bit_order)
+
+    def read(self, size, bit_order=None, fill=0):
+        '''Shift in `size` bytes, mosi (if any) held at `fill` bits.'''
+        if self._miso is None:
+            raise NameError('Shifter has no miso pin to read from')
+        return self.transfer(bytes([fill]) * size, bit_order)
+
+
+__all__ = ['Shifter']
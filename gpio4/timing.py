@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Precise timing on top of time.monotonic_ns.
+
+Waits target absolute deadlines so time spent between waits never
+accumulates into drift. time.sleep alone overshoots by tens of
+microseconds, so waits sleep until `spin` ns before the deadline and
+busy-wait the rest, which gives microsecond accuracy at the cost of some
+CPU for the tail only.
+
+    >>> t = Ticker(1000000)  # 1 kHz
+    >>> for i in range(1000):
+    ...     do_something()
+    ...     t.wait()
+    >>> t.stats.snapshot()
+"""
+
+import time
+
+SPIN_NS = 100000  # busy-wait the last 100us
+
+monotonic_ns = time.monotonic_ns
+
+
+def sleep_until(deadline, spin=SPIN_NS):
+    '''Wait until monotonic_ns() >= deadline, return lateness in ns.'''
+    remain = deadline - monotonic_ns()
+    if remain > spin:
+        time.sleep((remain - spin) / 1e9)
+    while True:
+        now = monotonic_ns()
+        if now >= deadline:
+            return now - deadline
+
+
+def sleep_ns(ns, spin=SPIN_NS):
+    return sleep_until(monotonic_ns() + ns, spin)
+
+
+class JitterStats(object):
+    '''Lateness of serviced deadlines in ns and number of overruns.'''
+    __slots__ = ('count', 'overruns', 'total', 'total_sq', 'min', 'max')
+
+    def __init__(self):
+        self.reset()
+
+    def __repr__(self):
+        return '<JitterStats {}>'.format(self.snapshot())
+
+    def reset(self):
+        self.count = self.overruns = 0
+        self.total = self.total_sq = 0
+        self.min = self.max = None
+
+    def record(self, lateness, overrun=False):
+        self.count += 1
+        self.total += lateness
+        self.total_sq += lateness * lateness
+        if self.min is None or lateness < self.min:
+            self.min = lateness
+        if self.max is None or lateness > self.max:
+            self.max = lateness
+        if overrun:
+            self.overruns += 1
+
+    def snapshot(self):
+        if not self.count:
+            return {'count': 0, 'overruns': self.overruns}
+        mean = self.total / self.count
+        var = max(self.total_sq / self.count - mean * mean, 0)
+        return {
+            'count': self.count, 'overruns': self.overruns,
+            'mean_ns': mean, 'stdev_ns': var ** 0.5,
+            'min_ns': self.min, 'max_ns': self.max,
+        }
+
+
+class Ticker(object):
+    '''
+    Periodic absolute deadlines every `period` ns. A tick that is serviced
+    after the next one is already due counts as an overrun, the schedule
+    is kept anyway so the average rate stays exact.
+    '''
+
+    def __init__(self, period, start=None, spin=SPIN_NS):
+        if period <= 0:
+            raise ValueError('Invalid period: {}'.format(period))
+        self.period = int(period)
+        self.spin = spin
+        self.deadline = monotonic_ns() if start is None else start
+        self.stats = JitterStats()
+
+    def wait(self):
+        '''Wait for the next deadline, return its lateness in ns.'''
+        lateness = sleep_until(self.deadline, self.spin)
+        self.stats.record(lateness, lateness >= self.period)
+        self.deadline += self.period
+        return lateness
+
+
+__all__ = ['SPIN_NS', 'monotonic_ns', 'sleep_until', 'sleep_ns',
+           'JitterStats', 'Ticker']
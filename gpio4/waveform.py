@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Play precomputed bit patterns to a set of pins at a fixed sample rate.
+
+A sample is an integer whose bit i is the level of pins[i], so a buffer
+can be bytes/bytearray (up to 8 pins), array.array or memoryview of wider
+integers, or a 2D NumPy array with one column per pin:
+
+    >>> from gpio4 import GPIO
+    >>> from gpio4.waveform import Waveform
+    >>> gpio = GPIO()
+    >>> gpio.setup(['PA6', 'PA7'], GPIO.OUT)
+    >>> wave = Waveform(['PA6', 'PA7'], rate=10000)  # step, dir
+    >>> wave.play(bytes([0b11, 0b10] * 200))
+    {'samples': 400, 'writes': 401, 'underruns': 0, ...}
+    >>> wave.stream(generate_chunks())  # double buffered, any length
+
+Only pins whose level changed are written. A sample that could not be
+written before the next one was due is counted as an underrun, the
+schedule is kept so the average rate stays exact.
+"""
+
+import queue
+import threading
+
+from . import GPIO
+from .timing import Ticker, SPIN_NS, monotonic_ns
+
+
+def _masks(samples, npins):
+    # convert any supported buffer to a sequence of integer bitmasks
+    if getattr(samples, 'ndim', 1) == 2:  # numpy, one column per pin
+        import numpy
+        if samples.shape[1] != npins:
+            raise ValueError('Expect {} columns, got {}'.format(
+                npins, samples.shape[1]))
+        weights = numpy.left_shift(1, numpy.arange(npins, dtype='u8'))
+        return samples.astype(bool).astype('u8').dot(weights).tolist()
+    if isinstance(samples, memoryview):
+        return samples.tolist()
+    return samples
+
+
+class Waveform(object):
+    def __init__(self, pins, rate, gpio=None, spin=SPIN_NS):
+        if rate <= 0:
+            raise ValueError('Invalid rate: {}'.format(rate))
+        self.gpio = gpio or GPIO()
+        self.pins = self.gpio._listify(pins)
+        self._gpios = [
+            self.gpio._pin_dict[self.gpio._get_pin_num(p, must_in_dict=True)]
+            for p in self.pins]
+        self.rate = rate
+        self.spin = spin
+        self._flag_stop = threading.Event()
+        self._state = None  # levels currently on the pins as bitmask
+        self._reset()
+
+    def __repr__(self):
+        return '<Waveform {} at {}Hz>'.format(self.pins, self.rate)
+
+    def _reset(self):
+        self.samples = self.writes = 0
+        self.underruns = 0
+        self._ticker = Ticker(int(1e9 / self.rate), spin=self.spin)
+
+    def stats(self):
+        return {
+            'samples': self.samples, 'writes': self.writes,
+            'underruns': self.underruns,
+            'lateness': self._ticker.stats.snapshot(),
+        }
+
+    def stop(self):
+        '''Stop playback from another thread.'''
+        self._flag_stop.set()
+
+    def _play(self, masks):
+        gpios, nbits = self._gpios, len(self._gpios)
+        full = (1 << nbits) - 1
+        ticker, stop = self._ticker, self._flag_stop
+        state = self._state
+        period = ticker.period
+        for mask in masks:
+            if stop.is_set():
+                return False
+            if ticker.wait() >= period:
+                self.underruns += 1
+            diff = full if state is None else (mask ^ state) & full
+            i = 0
+            while diff:
+                if diff & 1:
+                    gpios[i].value = (mask >> i) & 1
+                    self.writes += 1
+                diff >>= 1
+                i += 1
+            state = self._state = mask & full
+            self.samples += 1
+        return True
+
+    def play(self, samples, loop=False):
+        '''
+        Play samples once, `loop` times, or forever if loop is True (until
+        `stop()` is called). Return statistics.
+        '''
+        masks = _masks(samples, len(self._gpios))
+        if loop and not hasattr(masks, '__len__'):
+            masks = list(masks)  # one-shot iterable, keep it to repeat
+        if hasattr(masks, '__len__') and not len(masks):
+            raise ValueError('No samples to play')
+        self._flag_stop.clear()
+        self._reset()
+        count = 0
+        while not self._flag_stop.is_set() and self._play(masks):
+            count += 1
+            if loop is True:
+                continue
+            if count >= (loop or 1):
+                break
+        return self.stats()
+
+    def stream(self, chunks, depth=2):
+        '''
+        Play buffers yielded by iterable `chunks` back to back. The next
+        `depth` buffers are prepared by a producer thread while the current
+        one plays, a late buffer counts as an underrun. An exception raised
+        while producing buffers is raised again here once playback stopped.
+        '''
+        buffers = queue.Queue(depth)
+        npins = len(self._gpios)
+        error = []
+
+        def produce():
+            try:
+                for chunk in chunks:
+                    if self._flag_stop.is_set():
+                        break
+                    buffers.put(_masks(chunk, npins))
+            except Exception as e:
+                error.append(e)
+            finally:
+                buffers.put(None)
+
+        self._flag_stop.clear()
+        self._reset()
+        producer = threading.Thread(target=produce)
+        producer.daemon = True
+        producer.start()
+        masks = buffers.get()  # first buffer is allowed to be slow
+        self._ticker.deadline = monotonic_ns()
+        while masks is not None and self._play(masks):
+            try:
+                masks = buffers.get_nowait()
+            except queue.Empty:
+                self.underruns += 1
+                masks = buffers.get()
+                # restart the schedule instead of bursting to catch up
+                self._ticker.deadline = max(self._ticker.deadline,
+                                            monotonic_ns())
+        self._flag_stop.set()  # let producer finish
+        while producer.is_alive():
+            try:
+                buffers.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        producer.join()
+        if error:
+            raise error[0]
+        return self.stats()
+
+
+__all__ = ['Waveform']
@@ -13,6 +13,10 @@ setup(
     long_description_content_type='text/markdown',
     url="https://github.com/hankso/gpio4",
     packages=find_packages(),
+    python_requires='>=3.7',
+    entry_points={
+        'console_scripts': ['gpio4-bench = gpio4.bench:main'],
+    },
     classifiers=[
         "Development Status :: 3 - Alpha",
         "License :: OSI Approved :: MIT License",